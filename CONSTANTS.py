@@ -7,4 +7,82 @@ detector = Detector(
                         quad_sigma=0.0,
                         refine_edges=False,
                         decode_sharpening=0.25
-                    )
\ No newline at end of file
+                    )
+
+# What the camera is asked to deliver. None = BGR (the driver converts, we convert again to
+# gray). "YUYV" = raw YUV 4:2:2: detection reads the Y plane in place and BGR is only made
+# for frames someone actually shows. "MJPG" = compressed: gray is decoded straight from the
+# JPEG (no color conversion), BGR decoded separately on demand, so it pays off headless.
+# Cameras that refuse the format fall back to BGR.
+CAPTURE_FORMAT = None
+
+# ROI tracking: after tags are found, only re-detect in crops around them,
+# with a full-frame scan every FULL_SCAN_EVERY frames (or after a tag is lost)
+ROI_TRACKING = True
+FULL_SCAN_EVERY = 15
+
+# Adaptive detector tuning: switch between these pre-built detectors at runtime to keep
+# full-frame detection under DETECT_BUDGET_MS. Ordered quality -> speed.
+# min_tag_px = smallest tag side (in full-res px) that profile still finds reliably
+ADAPTIVE_DETECTOR = True
+DETECT_BUDGET_MS = 25
+DETECTOR_PROFILES = [
+    {"name": "quality",  "min_tag_px": 12, "params": dict(quad_decimate=1.0, refine_edges=True,  decode_sharpening=0.25)},
+    {"name": "balanced", "min_tag_px": 18, "params": dict(quad_decimate=1.5, refine_edges=True,  decode_sharpening=0.25)},
+    {"name": "speed",    "min_tag_px": 24, "params": dict(quad_decimate=2.0, refine_edges=False, decode_sharpening=0.25)},
+    {"name": "turbo",    "min_tag_px": 36, "params": dict(quad_decimate=3.0, refine_edges=False, decode_sharpening=0.25)},
+]
+DETECTOR_BASE_PARAMS = dict(families="tag25h9", nthreads=4, quad_sigma=0.0)
+
+# Multi-camera (camera_set.py): one entry per webcam around the tray.
+# calibration = npz from calibrate.py; world_from_camera = 4x4 camera pose in the shared
+# world frame (None -> take it from the npz, or identity for a single camera)
+CAMERAS = [
+    {"name": "cam0", "source": 0, "calibration": "camera_calibration.npz", "world_from_camera": None},
+]
+CAMERA_SET_PROFILE = "speed"  # which DETECTOR_PROFILES entry each camera worker runs
+
+# Process-pool detection (detect_pool.py): farm frames out to DETECT_POOL_WORKERS detector
+# processes (None -> cores - 1). DETECT_POOL_TILES = (rows, cols) also splits each frame
+# into overlapping tiles, for high-res frames that one core can't get through in time.
+# Replaces ROI tracking / adaptive tuning when on.
+DETECT_POOL = False
+DETECT_POOL_WORKERS = None
+DETECT_POOL_TILES = (1, 1)
+DETECT_POOL_PARAMS = dict(DETECTOR_BASE_PARAMS, nthreads=1, quad_decimate=2.0, refine_edges=False, decode_sharpening=0.25)
+
+# Show the undistorted (remapped) frame in the camera views. Display only, detection and
+# pose always use the raw frame.
+UNDISTORT_DISPLAY = False
+
+# On-frame tag labels + axes (overlay.py). The "pos: x=..." numbers only refresh
+# OVERLAY_NUMERIC_HZ times a second; OVERLAY = False skips drawing entirely (headless).
+OVERLAY = True
+OVERLAY_NUMERIC_HZ = 5
+
+# Rates (scheduler.py): preview, detection and pose each run on their own clock instead of
+# all riding one 15 ms UI tick. None = as fast as frames arrive. The velocity panel rate is
+# set on the Settings page; STATUS_HZ is how often the dashboard's stats line refreshes.
+PREVIEW_FPS = 60
+DETECT_FPS = None
+POSE_FPS = None
+STATUS_HZ = 2
+
+# Velocity / pose estimation per tool (tracker.py)
+#   "kalman"     kalman.PoseFilter: smoothed pose + velocities, predictions at any time, and
+#                lost tags coast until their uncertainty passes COAST_POS_STD / COAST_ROT_STD
+#   "window"     velocity.WindowedVelocity: least-squares polynomial over each tag's last
+#                VELOCITY_WINDOW samples (Savitzky-Golay on the real timestamps), raw pose
+#   "difference" raw two-sample finite difference
+#   ("window" / "difference" freeze a lost tag's velocity for LAST_SEEN_LIMIT ms)
+VELOCITY_ESTIMATOR = "kalman"
+VELOCITY_WINDOW = 10                      # samples fitted per tag ("window")
+VELOCITY_POLY_ORDER = 2                   # 1 = straight line, 2 = follows acceleration with less lag
+VELOCITY_MAX_SPAN = 0.5                   # s: older samples in the window are ignored
+FILTER_ORDER = 2                          # 2 = constant velocity, 3 = constant acceleration
+FILTER_POS_STD = (0.0005, 0.0005, 0.002)  # m, per camera axis (depth is the noisy one)
+FILTER_ROT_STD = 0.02                     # rad
+FILTER_POS_PROCESS = 0.05                 # white noise density on the highest derivative (m^2/s^3 for order 2)
+FILTER_ROT_PROCESS = 2.0                  # (rad^2/s^3 for order 2)
+COAST_POS_STD = 0.05                      # m: stop trusting a lost tag's prediction past this (~0.5 s)
+COAST_ROT_STD = 0.35                      # rad
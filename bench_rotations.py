@@ -0,0 +1,73 @@
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+import rotations
+
+# Micro-benchmark: angular velocity the old way (cv2.Rodrigues per sample, then R_cur @ R_prev.T,
+# arccos of the trace and the skew part / sin(angle), one tag at a time) against the batched
+# quaternion kernel in rotations.py, plus how accurate each one is over the whole angle range.
+
+
+def per_tag_angular_velocity(rvec_prev, rvec_cur, dt):
+    # what ToolTracker used to do for every tag on every frame
+    R_prev, _ = cv2.Rodrigues(rvec_prev.reshape(3, 1))
+    R_cur, _ = cv2.Rodrigues(rvec_cur.reshape(3, 1))
+    R_delta = R_cur @ R_prev.T
+    tr = np.clip((np.trace(R_delta) - 1) / 2.0, -1.0, 1.0)
+    angle = np.arccos(tr)
+    if dt <= 1e-6 or angle < 1e-6:
+        return np.zeros(3)
+    w = (R_delta - R_delta.T) / (2 * np.sin(angle))
+    return np.array([w[2, 1], w[0, 2], w[1, 0]]) * (angle / dt)
+
+
+def batched_angular_velocity(rvec_prev, rvec_cur, dt):
+    q_prev = rotations.quat_exp(rvec_prev)
+    q_cur = rotations.quat_exp(rvec_cur)
+    return rotations.angular_velocity(q_prev, q_cur, dt)
+
+
+def timed(fn, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="per-tag vs batched angular velocity")
+    parser.add_argument("--tags", type=int, nargs="+", default=[1, 5, 20, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    dt = 1 / 30
+
+    print(f"{'tags':>6} {'per tag':>12} {'batched':>12} {'speedup':>8}")
+    for n in args.tags:
+        rvec_prev = rng.normal(0, 1, (n, 3))
+        rvec_cur = rvec_prev + rng.normal(0, 0.05, (n, 3))
+        old = timed(lambda: [per_tag_angular_velocity(rvec_prev[i], rvec_cur[i], dt) for i in range(n)], args.repeat)
+        new = timed(lambda: batched_angular_velocity(rvec_prev, rvec_cur, dt), args.repeat)
+        print(f"{n:>6} {old * 1e6:>10.1f}us {new * 1e6:>10.1f}us {old / new:>7.1f}x")
+
+    # accuracy: rotate by a known angle about a random axis in one frame, from a random start
+    print(f"\n{'angle':>10} {'per tag err':>12} {'batched err':>12}  (rad/s, worst of 200)")
+    for angle in (1e-7, 1e-4, 0.1, 1.0, 3.0, np.pi - 1e-4, np.pi - 1e-7):
+        axis = rng.normal(size=(200, 3))
+        axis /= np.linalg.norm(axis, axis=1, keepdims=True)
+        rvec_prev = rng.normal(0, 1, (200, 3))
+        q_cur = rotations.quat_mul(rotations.quat_exp(axis * angle), rotations.quat_exp(rvec_prev))
+        rvec_cur = rotations.quat_log(q_cur)
+        truth = axis * angle / dt
+        old = np.array([per_tag_angular_velocity(rvec_prev[i], rvec_cur[i], dt) for i in range(200)])
+        new = batched_angular_velocity(rvec_prev, rvec_cur, dt)
+        print(f"{angle:>10.7f} {np.abs(old - truth).max():>12.2e} {np.abs(new - truth).max():>12.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import threading
+
+import numpy as np
+
+
+class Buffer:
+    """
+    A pooled ndarray with a reference count. Ownership rules (everything on the capture path
+    follows these; frames, gray images and annotated copies are all Buffers):
+      1. acquire() hands you ONE reference; you own the array until you release() it.
+      2. Handing the array to anything that outlives your call (a queue, another thread, a
+         ring buffer) means retain() first: one reference per holder, each released once.
+      3. Only the acquirer writes into it, and only before it's been shared. After your
+         release() don't touch it, the pool may already have handed it to someone else.
+      4. Forgetting to release only costs an allocation later (the pool makes a fresh one);
+         releasing more often than you retained is a bug and raises.
+    """
+
+    __slots__ = ("array", "pool", "refs", "attached")
+
+    def __init__(self, array, pool):
+        self.array = array
+        self.pool = pool
+        self.refs = 1
+        self.attached = []  # buffers that live exactly as long as this one (see attach)
+
+    def retain(self):
+        with self.pool.lock:
+            if self.refs <= 0:
+                raise RuntimeError("retain() on a buffer that was already released")
+            self.refs += 1
+        return self
+
+    def release(self):
+        with self.pool.lock:
+            if self.refs <= 0:
+                raise RuntimeError("buffer released more often than it was retained")
+            self.refs -= 1
+            if self.refs > 0:
+                return
+            attached, self.attached = self.attached, []
+            self.pool._recycle(self)
+        for buf in attached:
+            buf.release()
+
+    def attach(self, other):
+        # `other` (e.g. the BGR image decoded from this raw frame) takes over our reference
+        # count: it gets released when we do, not by whoever happened to create it
+        with self.pool.lock:
+            self.attached.append(other)
+        return other
+
+
+class BufferPool:
+    """
+    Free lists of same-shape arrays, so steady-state capture/convert/draw allocates nothing.
+    acquire(shape, dtype) -> Buffer (a recycled one if there is one); released buffers go back
+    on the free list, up to `keep` per shape (the rest are left to the GC).
+    allocated / reused count how often each happened (reused should dominate after warm-up).
+    Thread safe.
+    """
+
+    def __init__(self, keep=16, name="buffers"):
+        self.keep = keep
+        self.name = name
+        self.lock = threading.Lock()
+        self._free = {}  # (shape, dtype) -> [ndarray]
+        self.allocated = 0
+        self.reused = 0
+
+    def acquire(self, shape, dtype=np.uint8):
+        key = (tuple(shape), np.dtype(dtype))
+        with self.lock:
+            free = self._free.get(key)
+            if free:
+                self.reused += 1
+                return Buffer(free.pop(), self)
+            self.allocated += 1
+        return Buffer(np.empty(key[0], dtype=key[1]), self)
+
+    def adopt(self, array):
+        # an array somebody else allocated (e.g. cv2 on a size change) joins the pool when released
+        with self.lock:
+            self.allocated += 1
+        return Buffer(array, self)
+
+    def _recycle(self, buf):
+        # lock held by Buffer.release
+        free = self._free.setdefault((buf.array.shape, buf.array.dtype), [])
+        if len(free) < self.keep:
+            free.append(buf.array)
+        buf.array = None
+
+    def summary(self):
+        return f"{self.name}: {self.allocated} allocated, {self.reused} reused"
+
+
+class CornerPacker:
+    """
+    Packs detections' corners into ONE reused (N, 4, 2) float64 array for the pose solver
+    (instead of np.array([...]) / astype() per frame). pack() returns a view that stays valid
+    until the next pack() on the same packer, so one packer per thread, used synchronously.
+    """
+
+    def __init__(self, capacity=16):
+        self._buf = np.empty((capacity, 4, 2), dtype=np.float64)
+
+    def pack(self, tags):
+        n = len(tags)
+        if n > len(self._buf):
+            self._buf = np.empty((max(n, 2 * len(self._buf)), 4, 2), dtype=np.float64)
+        out = self._buf[:n]
+        for i, tag in enumerate(tags):
+            out[i] = tag.corners
+        return out
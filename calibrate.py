@@ -33,4 +33,5 @@ print("Camera Matrix:\n", camera_matrix)
 print("Distortion Coefficients:\n", dist_coeffs)
 
 # Save for later use
-np.savez("camera_calibration.npz", camera_matrix=camera_matrix, dist_coeffs=dist_coeffs)
\ No newline at end of file
+np.savez("camera_calibration.npz", camera_matrix=camera_matrix, dist_coeffs=dist_coeffs,
+         image_size=np.array(gray_shape))
\ No newline at end of file
@@ -0,0 +1,301 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+import cv2
+
+from buffers import BufferPool
+
+
+class Frame:
+    # One captured image plus the bookkeeping consumers need
+    # seq counts every frame the reader thread got off the device (starts at 1)
+    # timestamp is when the frame was captured, on the time.monotonic() clock (see CaptureClock)
+    # stamps collects time.monotonic() as the frame passes each stage ("capture", "read", ...)
+    # buffer is the pooled buffers.Buffer behind image (None for plain images); CameraStream
+    # hands frames out with a reference already taken, so whoever gets one calls release()
+    # gray is the luminance straight from the camera (raw YUYV / MJPG capture), None for BGR
+    # capture; image (BGR) is then only made on first access, once, by to_color()
+    def __init__(self, image, seq, timestamp, stamps=None, buffer=None, gray=None, to_color=None):
+        self._image = image
+        self.gray = gray
+        self.seq = seq
+        self.timestamp = timestamp
+        self.stamps = stamps if stamps is not None else {"capture": timestamp}
+        self.buffer = buffer
+        self._to_color = to_color
+        self._color_lock = threading.Lock() if to_color is not None else None
+
+    @property
+    def image(self):
+        if self._image is None and self._to_color is not None:
+            with self._color_lock:  # several consumers may want it at once: convert once
+                if self._image is None:
+                    self._image = self._to_color()
+        return self._image
+
+    @property
+    def has_color(self):
+        # False while a raw frame hasn't been converted (nobody asked for .image yet)
+        return self._image is not None
+
+    def stamp(self, stage):
+        self.stamps[stage] = time.monotonic()
+
+    def retain(self):
+        if self.buffer is not None:
+            self.buffer.retain()
+        return self
+
+    def release(self):
+        if self.buffer is not None:
+            self.buffer.release()
+
+
+class CaptureClock:
+    """
+    Turns the driver's per-frame timestamp (CAP_PROP_POS_MSEC) into time.monotonic() time.
+    The offset between the two clocks is tracked as the smallest (arrival - device time)
+    seen so far, since a frame can only ever arrive AFTER it was exposed; it creeps up
+    slowly so the two clocks drifting apart doesn't get locked in.
+    Falls back to the grab time when the driver has no usable timestamp
+    (0, going backwards, or way off from the arrival time).
+    """
+
+    def __init__(self, creep=1e-3, max_gap=1.0):
+        self.creep = creep        # s of offset creep per s of capture
+        self.max_gap = max_gap    # device time this far from arrival -> don't trust it, re-sync
+        self.offset = None
+        self.last_device = None
+        self.last_arrival = None
+        self.source = "grab"      # "driver" once device timestamps are being used
+
+    def capture_time(self, device_ms, grabbed_at):
+        device = device_ms / 1000.0 if device_ms and device_ms > 0 else None
+        if device is None or (self.last_device is not None and device <= self.last_device):
+            self.offset = None
+            self.source = "grab"
+            return grabbed_at
+
+        candidate = grabbed_at - device
+        if self.offset is None or abs(candidate - self.offset) > self.max_gap:
+            self.offset = candidate
+        else:
+            self.offset = min(self.offset + self.creep * (grabbed_at - self.last_arrival), candidate)
+        self.last_device = device
+        self.last_arrival = grabbed_at
+        self.source = "driver"
+        return device + self.offset
+
+
+# Raw capture (CAP_PROP_CONVERT_RGB off), see CONSTANTS.CAPTURE_FORMAT
+#   gray(raw, w, h)       -> luminance for the detector
+#   bgr(raw, w, h, dst)   -> BGR for whoever wants to look at the frame (into dst if it can)
+#   pooled                -> raw buffers have a fixed size, so they can come from the BufferPool
+RawFormat = namedtuple("RawFormat", ["gray", "bgr", "pooled"])
+
+
+def _yuyv_gray(raw, w, h):
+    return raw.reshape(h, w, 2)[:, :, 0]  # every other byte is Y: a strided view, nothing copied
+
+
+def _yuyv_bgr(raw, w, h, dst):
+    return cv2.cvtColor(raw.reshape(h, w, 2), cv2.COLOR_YUV2BGR_YUYV, dst=dst)
+
+
+def _mjpg_gray(raw, w, h):
+    return cv2.imdecode(raw, cv2.IMREAD_GRAYSCALE)  # decodes Y only, no color conversion
+
+
+def _mjpg_bgr(raw, w, h, dst):
+    return cv2.imdecode(raw, cv2.IMREAD_COLOR)  # imdecode can't decode into dst
+
+
+RAW_FORMATS = {
+    "YUYV": RawFormat(_yuyv_gray, _yuyv_bgr, pooled=True),
+    "MJPG": RawFormat(_mjpg_gray, _mjpg_bgr, pooled=False),  # compressed size changes every frame
+}
+
+
+class CameraStream:
+    """
+    Owns a cv2.VideoCapture and reads it on a background thread.
+    Frames land in a small ring buffer so the UI never waits on the sensor,
+    consumers just grab whatever is newest with latest().
+    Images are decoded straight into recycled arrays from self.pool (buffers.py): the ring
+    holds one reference per frame, and latest()/wait_latest() hand out frames with another
+    reference taken for the caller, who must frame.release() it when done (and must not
+    write into frame.image, other consumers may have the same frame).
+    capture_format = "YUYV" / "MJPG" asks the camera for raw frames instead of BGR: frames then
+    carry frame.gray for detection, and frame.image is converted on first use only (see Frame).
+    """
+
+    def __init__(self, source=0, buffer_size=3, pool=None, capture_format=None):
+        self.source = source
+        self.capture_format = capture_format
+        self.raw_format = None  # RawFormat once the camera agreed to capture_format
+        self.frame_size = None  # (w, h) of raw frames
+        self.cap = None
+        self.ring = deque()
+        self.buffer_size = buffer_size
+        self.pool = pool if pool is not None else BufferPool(name="camera frames")
+        self._shape = None      # last frame shape, what the next buffer gets acquired as
+
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)
+        self._thread = None
+        self._running = False
+
+        self.clock = CaptureClock()
+        self.seq = 0            # last sequence number read off the device
+        self._last_taken = 0    # last sequence number handed to a consumer
+        self.dropped = 0        # frames that were never handed out
+
+    def start(self):
+        if self._running:
+            return self
+        if self.cap is None:
+            self.cap = cv2.VideoCapture(self.source)
+            # keep the driver queue short so we don't read stale frames
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            if self.capture_format:
+                self._negotiate(self.capture_format)
+        self._running = True
+        self._thread = threading.Thread(target=self._reader, name="camera-reader", daemon=True)
+        self._thread.start()
+        return self
+
+    def _negotiate(self, fourcc):
+        # Ask for raw frames in `fourcc`; stay on BGR if the camera/backend won't hand them over
+        if fourcc not in RAW_FORMATS:
+            raise ValueError(f"Unknown capture format {fourcc!r} (known: {sorted(RAW_FORMATS)})")
+        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        code = int(self.cap.get(cv2.CAP_PROP_FOURCC))
+        got = "".join(chr((code >> 8 * i) & 0xFF) for i in range(4))
+        if got != fourcc or not self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 0):
+            self._fall_back_to_bgr(f"camera gave {got!r}")
+            return
+        self.raw_format = RAW_FORMATS[fourcc]
+        self.frame_size = (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    def _fall_back_to_bgr(self, why):
+        print(f"Camera {self.source}: no {self.capture_format} capture ({why}), using BGR")
+        self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 1)
+        self.raw_format = None
+        self._shape = None
+
+    def _raw_frame(self, raw, buf, captured, stamps):
+        fmt = self.raw_format
+        w, h = self.frame_size
+        gray = fmt.gray(raw, w, h)
+
+        def to_color():
+            if buf is None:
+                return fmt.bgr(raw, w, h, None)
+            # the BGR copy lives and dies with the raw buffer it came from
+            color = buf.attach(self.pool.acquire((h, w, 3)))
+            return fmt.bgr(raw, w, h, color.array)
+
+        return Frame(None, 0, captured, stamps, buffer=buf, gray=gray, to_color=to_color)
+
+    def _reader(self):
+        while self._running:
+            # grab + retrieve instead of read() so the fallback timestamp is taken before decoding
+            grabbed = self.cap.grab()
+            grabbed_at = time.monotonic()
+            pooled = self.raw_format is None or self.raw_format.pooled
+            buf = self.pool.acquire(self._shape) if pooled and self._shape is not None else None
+            if grabbed:
+                ret, image = self.cap.retrieve(buf.array) if buf is not None else self.cap.retrieve()
+            else:
+                ret, image = False, None
+            if not ret:
+                if buf is not None:
+                    buf.release()
+                # camera hiccup: try again shortly
+                time.sleep(0.01)
+                continue
+            if pooled and (buf is None or image is not buf.array):
+                # first frame, or the size/format changed: cv2 allocated, adopt that one
+                if buf is not None:
+                    buf.release()
+                buf = self.pool.adopt(image)
+                self._shape = image.shape
+            captured = self.clock.capture_time(self.cap.get(cv2.CAP_PROP_POS_MSEC), grabbed_at)
+            stamps = {"capture": captured, "grab": grabbed_at}
+            if self.raw_format is None:
+                frame = Frame(image, 0, captured, stamps, buffer=buf)
+            else:
+                try:
+                    frame = self._raw_frame(image, buf, captured, stamps)
+                except (ValueError, cv2.error) as e:
+                    # raw buffer isn't what the format promised (backend quirk): BGR from now on
+                    if buf is not None:
+                        buf.release()
+                    self._fall_back_to_bgr(e)
+                    continue
+            frame.stamp("read")
+            evicted = None
+            with self._lock:
+                self.seq += 1
+                frame.seq = self.seq
+                self.ring.append(frame)  # our reference moves to the ring
+                if len(self.ring) > self.buffer_size:
+                    evicted = self.ring.popleft()
+                self._new_frame.notify_all()
+            if evicted is not None:
+                evicted.release()
+
+    def latest(self, newer_than=0):
+        """
+        Returns (frame, dropped) where frame is the newest Frame (or None if nothing
+        newer than `newer_than` has arrived) and dropped is how many frames were
+        skipped since `newer_than` (pass the seq of the last frame you used).
+        The frame comes with a reference for you: frame.release() when you're done with it.
+        """
+        with self._lock:
+            return self._take(newer_than)
+
+    def wait_latest(self, newer_than=0, timeout=None):
+        # Same as latest(), but blocks until a frame newer than `newer_than` shows up
+        with self._lock:
+            self._new_frame.wait_for(lambda: self.seq > newer_than or not self._running, timeout)
+            return self._take(newer_than)
+
+    def _take(self, newer_than):
+        if not self.ring or self.ring[-1].seq <= newer_than:
+            return None, 0
+        frame = self.ring[-1]
+        # skipped is per-consumer (relative to the seq they passed in),
+        # self.dropped counts frames nobody ever took
+        skipped = frame.seq - newer_than - 1 if newer_than > 0 else 0
+        if frame.seq > self._last_taken:
+            if self._last_taken > 0:
+                self.dropped += frame.seq - self._last_taken - 1
+            self._last_taken = frame.seq
+        return frame.retain(), skipped
+
+    def set(self, prop, value):
+        # Forward capture properties (exposure, etc) to the device
+        if self.cap is None:
+            return False
+        return self.cap.set(prop, value)
+
+    def get(self, prop):
+        if self.cap is None:
+            return 0.0
+        return self.cap.get(prop)
+
+    def stop(self):
+        self._running = False
+        with self._lock:
+            self._new_frame.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def release(self):
+        self.stop()
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
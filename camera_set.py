@@ -0,0 +1,275 @@
+import multiprocessing as mp
+import queue
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from buffers import CornerPacker
+from camera import CameraStream
+from detector_tuning import get_detector
+from geometry import calibrated_size
+from pose_solver import PoseSolver
+from roi_tracker import RoiTracker
+from rotations import from_matrix, matrix_to_rotvec, to_matrix
+
+# What one camera worker sends back per processed frame. Everything is in that camera's
+# frame: ids (N,), rotations (N, 3, 3), tvecs (N, 3), errors (N,) RMS reprojection px
+CameraReport = namedtuple("CameraReport", ["camera", "seq", "timestamp", "ids", "rotations", "tvecs", "errors"])
+
+# One fused tool pose in the world frame. position (3,), rotation (3, 3), rvec (3,),
+# cameras = names of the cameras that saw it, timestamp = newest capture time that went in
+ToolPose = namedtuple("ToolPose", ["tag_id", "position", "rotation", "rvec", "cameras", "timestamp"])
+
+
+def load_camera(spec):
+    """
+    Fills in one CONSTANTS.CAMERAS entry:
+      name, source            -> passed through
+      calibration             -> npz with camera_matrix / dist_coeffs (like calibrate.py writes),
+                                 plus an optional 4x4 world_from_camera
+      world_from_camera       -> overrides the npz one; identity if neither has it
+      format                  -> capture format ("YUYV" / "MJPG", see CONSTANTS.CAPTURE_FORMAT), default BGR
+    """
+    spec = dict(spec)
+    data = np.load(spec["calibration"])
+    spec["camera_matrix"] = np.asarray(data["camera_matrix"], dtype=np.float64)
+    spec["dist_coeffs"] = np.asarray(data["dist_coeffs"], dtype=np.float64)
+    spec["calibrated_size"] = calibrated_size(data)
+    extrinsic = spec.get("world_from_camera")
+    if extrinsic is None and "world_from_camera" in data:
+        extrinsic = data["world_from_camera"]
+    spec["world_from_camera"] = np.eye(4) if extrinsic is None else np.asarray(extrinsic, dtype=np.float64)
+    spec.setdefault("name", f"cam{spec['source']}")
+    return spec
+
+
+def _camera_worker(spec, obj_points, detector_params, roi_tracking, out, stop):
+    # Runs in its own process: capture + detect + pose for one camera, nothing shared
+    camera = CameraStream(spec["source"], capture_format=spec.get("format")).start()
+    detector = get_detector(**detector_params)
+    if roi_tracking:
+        detector = RoiTracker(detector)
+    solver = PoseSolver(spec["camera_matrix"], spec["dist_coeffs"], obj_points,
+                        calibrated_size=spec["calibrated_size"])
+    packer = CornerPacker()
+    gray = None  # converted into the same array every frame (cv2 reallocates on a size change)
+
+    last_seq = 0
+    try:
+        while not stop.is_set():
+            frame, _ = camera.wait_latest(last_seq, timeout=0.1)
+            if frame is None:
+                continue
+            last_seq = frame.seq
+
+            # a bad frame only costs that frame: an exception here would end the process and
+            # take this camera out of fusion for good
+            try:
+                if frame.gray is not None:
+                    luma = frame.gray  # raw capture: the camera's own Y plane, nothing to convert
+                else:
+                    gray = luma = cv2.cvtColor(frame.image, cv2.COLOR_BGR2GRAY, dst=gray)
+                tags = detector.detect(luma)
+                size = luma.shape[::-1]
+            except Exception as e:
+                print(f"Camera worker error ({spec['name']}, detect): {e}")
+                continue
+            finally:
+                frame.release()  # back to the camera's pool (luma may be a view into it)
+            try:
+                ids = np.array([int(tag.tag_id) for tag in tags], dtype=np.int64)
+                batch = solver.solve(packer.pack(tags), image_size=size)
+            except Exception as e:
+                print(f"Camera worker error ({spec['name']}, pose): {e}")
+                continue
+            ok = batch.ok
+            report = CameraReport(spec["name"], frame.seq, frame.timestamp, ids[ok],
+                                  batch.rotations[ok], batch.tvecs[ok], batch.errors[ok])
+            try:
+                out.put_nowait(report)
+            except queue.Full:
+                pass  # main side is behind; it only wants the newest report per camera anyway
+    finally:
+        camera.release()
+
+
+def _ema(old, new, alpha=0.1):
+    return new if old is None else old + alpha * (new - old)
+
+
+class CameraSet:
+    """
+    N cameras around the tray, each with its own intrinsics (calibration npz) and extrinsic
+    (world_from_camera, 4x4). Every camera gets its own worker PROCESS doing capture, detection
+    and pose, so throughput scales with the number of cores instead of fighting over the GIL.
+
+    The main side only drains small per-frame reports (poll) and fuses them (fuse):
+    each tag seen by one or more cameras becomes one ToolPose in the world frame.
+    """
+
+    def __init__(self, cameras, obj_points, detector_params, roi_tracking=True, max_age=None):
+        self.cameras = [load_camera(spec) for spec in cameras]
+        self.by_name = {spec["name"]: spec for spec in self.cameras}
+        self.obj_points = np.asarray(obj_points, dtype=np.float64)
+        self.detector_params = dict(detector_params)
+        self.roi_tracking = roi_tracking
+        # reports older than this (s) don't take part in fusion; None = per camera, from how
+        # often its reports actually arrive and how late (see report_max_age)
+        self.max_age = max_age
+
+        # spawn, not fork: the parent may already have Tk / camera / detector threads running
+        self._ctx = mp.get_context("spawn")
+        self._out = None
+        self._stop = None
+        self._procs = []
+
+        self.latest = {}                # camera name -> newest CameraReport
+        self.frames = {spec["name"]: 0 for spec in self.cameras}
+        self._started_at = None
+        self._interval = {}             # camera name -> EMA seconds between its frames
+        self._latency = {}              # camera name -> EMA seconds from capture to poll()
+
+    # --- lifecycle ---
+
+    def start(self):
+        if self._procs:
+            return self
+        self._out = self._ctx.Queue(maxsize=4 * len(self.cameras))
+        self._stop = self._ctx.Event()
+        for spec in self.cameras:
+            p = self._ctx.Process(
+                target=_camera_worker,
+                args=(spec, self.obj_points, self.detector_params, self.roi_tracking, self._out, self._stop),
+                name=f"camera-{spec['name']}", daemon=True,
+            )
+            p.start()
+            self._procs.append(p)
+        self._started_at = time.monotonic()
+        return self
+
+    def stop(self):
+        if not self._procs:
+            return
+        self._stop.set()
+        # keep draining so no worker is stuck on a full queue while we join it
+        deadline = time.monotonic() + 2.0
+        while any(p.is_alive() for p in self._procs) and time.monotonic() < deadline:
+            self.poll()
+            time.sleep(0.01)
+        for p in self._procs:
+            if p.is_alive():
+                p.terminate()
+            p.join(timeout=1.0)
+        self._procs = []
+
+    # --- results ---
+
+    def poll(self):
+        # Pull everything the workers produced; returns how many reports came in
+        count = 0
+        while True:
+            try:
+                report = self._out.get_nowait()
+            except (queue.Empty, AttributeError):
+                return count
+            name = report.camera
+            prev = self.latest.get(name)
+            if prev is not None and report.timestamp > prev.timestamp:
+                self._interval[name] = _ema(self._interval.get(name), report.timestamp - prev.timestamp)
+            self._latency[name] = _ema(self._latency.get(name), time.monotonic() - report.timestamp)
+            self.latest[report.camera] = report
+            self.frames[report.camera] += 1
+            count += 1
+
+    def fps(self):
+        # per-camera processed frames per second since start()
+        if self._started_at is None:
+            return {}
+        elapsed = max(time.monotonic() - self._started_at, 1e-6)
+        return {name: n / elapsed for name, n in self.frames.items()}
+
+    def report_max_age(self, name):
+        # How old camera `name`'s newest report may be and still count: its usual capture ->
+        # poll latency plus a few frame intervals, so a slow machine (or a slow camera) still
+        # fuses instead of dropping every view. 1 s until there are two reports to go by.
+        if self.max_age is not None:
+            return self.max_age
+        interval = self._interval.get(name)
+        if interval is None:
+            return 1.0
+        return max(self._latency.get(name, 0.0) + 3.0 * interval, 0.1)
+
+    def fuse(self, now=None):
+        """
+        Returns {tag_id: ToolPose} from the newest report of every camera that is
+        no older than its report_max_age(). Per view:
+            world pose = world_from_camera @ camera_from_tag
+            weight     = 1 / ((err_px + 0.5)^2 * z^2)
+        (reprojection error in px, and depth since a pixel of error costs more further away).
+        Position = weighted mean; rotation = weighted quaternion average (top eigenvector of
+        sum w q q^T, which doesn't care about the q / -q sign ambiguity).
+        """
+        now = time.monotonic() if now is None else now
+        reports = [r for r in self.latest.values()
+                   if len(r.ids) and now - r.timestamp <= self.report_max_age(r.camera)]
+        if not reports:
+            return {}
+
+        ids, R, t, w, cams, stamps = [], [], [], [], [], []
+        for r in reports:
+            E = self.by_name[r.camera]["world_from_camera"]
+            R.append(E[:3, :3] @ r.rotations)
+            t.append(r.tvecs @ E[:3, :3].T + E[:3, 3])
+            w.append(1.0 / (((r.errors + 0.5) ** 2) * np.maximum(r.tvecs[:, 2], 1e-3) ** 2))
+            ids.append(r.ids)
+            cams.extend([r.camera] * len(r.ids))
+            stamps.append(np.full(len(r.ids), r.timestamp))
+        ids, R, t, w, stamps = map(np.concatenate, (ids, R, t, w, stamps))
+
+        tag_ids, group = np.unique(ids, return_inverse=True)
+        k = len(tag_ids)
+
+        wsum = np.zeros(k)
+        np.add.at(wsum, group, w)
+        position = np.zeros((k, 3))
+        np.add.at(position, group, w[:, None] * t)
+        position /= wsum[:, None]
+
+        q = from_matrix(R)
+        M = np.zeros((k, 4, 4))
+        np.add.at(M, group, w[:, None, None] * q[:, :, None] * q[:, None, :])
+        _, vecs = np.linalg.eigh(M)
+        q_mean = vecs[:, :, -1]
+        rotation = to_matrix(q_mean)
+        rvec = matrix_to_rotvec(rotation)
+
+        latest = np.full(k, -np.inf)
+        np.maximum.at(latest, group, stamps)
+
+        fused = {}
+        for i, tag_id in enumerate(tag_ids):
+            seen_by = tuple(sorted({cams[j] for j in np.flatnonzero(group == i)}))
+            fused[int(tag_id)] = ToolPose(int(tag_id), position[i], rotation[i], rvec[i], seen_by, latest[i])
+        return fused
+
+
+if __name__ == "__main__":
+    import CONSTANTS
+    from tracker import obj_points
+
+    profile = next(p for p in CONSTANTS.DETECTOR_PROFILES if p["name"] == CONSTANTS.CAMERA_SET_PROFILE)
+    cameras = CameraSet(CONSTANTS.CAMERAS, obj_points, {**CONSTANTS.DETECTOR_BASE_PARAMS, **profile["params"]},
+                        roi_tracking=CONSTANTS.ROI_TRACKING).start()
+    try:
+        while True:
+            time.sleep(0.05)
+            cameras.poll()
+            for tag_id, pose in cameras.fuse().items():
+                x, y, z = pose.position
+                print(f"Tag {tag_id}: pos x={x:.3f}, y={y:.3f}, z={z:.3f} seen by {', '.join(pose.cameras)}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cameras.stop()
@@ -1,33 +1,19 @@
 import customtkinter as ctk
 import cv2
 import numpy as np
-from PIL import Image
 import threading
-from collections import defaultdict, deque
-import time
 import math
 import classes
 import helpers
 import CONSTANTS
-
-# Load calibration
-data = np.load("camera_calibration.npz")
-camera_matrix = data['camera_matrix']
-dist_coeffs = data['dist_coeffs']
-
-# Define physical tag size (in meters)
-tag_size = 0.015
-
-# Real-world 3D coordinates of tag corners (same order as pupil_apriltags output)
-obj_points = np.array([
-    [-tag_size/2,  tag_size/2, 0],
-    [ tag_size/2,  tag_size/2, 0],
-    [ tag_size/2, -tag_size/2, 0],
-    [-tag_size/2, -tag_size/2, 0]
-], dtype=np.float32)
-
-# Open webcam globally
-cap = cv2.VideoCapture(0)
+from camera import CameraStream
+from frame_bus import FrameBus
+from detect_pool import DetectorPool
+from preview import PreviewRenderer, preview_label
+from overlay import OverlayCompositor
+from registry import RegistryView, ToolRegistry
+from scheduler import Scheduler, format_rates
+from tracker import ToolTracker, load_pose_solver, make_detector
 
 # Set appearance mode and theme
 ctk.set_appearance_mode("System")
@@ -211,27 +197,21 @@ class PreparationPage(BasePage):
         self.switch.grid(row=5, column=1, sticky="ew", padx=10, pady=(0,10))
 
         # --- right: camera ---
-        self.stop_camera = False
-        self.camera_label = ctk.CTkLabel(right, text="")
+        # frames come off the shared bus; this page only shows them (no velocity)
+        self.feed = self.controller.frame_bus.subscribe(self, {"preview"})
+        self.camera_label = preview_label(right)
         self.camera_label.pack(pady=10, expand=True)
+        self.preview = PreviewRenderer(self.camera_label)
+        self.preview.set_target(640, 480)
+        # preview runs on its own clock, started/stopped with the page
+        self.scheduler = Scheduler(self)
+        self.scheduler.every("preview", CONSTANTS.PREVIEW_FPS, self.update_video)
 
-        # initial render of the list
-        self._render_tool_list()
-
-    def _render_tool_list(self):
-        tm = helpers.get_tmap(self.controller)
-        pm = helpers.get_pmap(self.controller)
-
-        lines = []
-        for tid in sorted(tm.keys()):
-            tool_name = tm[tid]
-            pid = pm.get(tid, "<no pos>")   # safely get pid, fallback if not found
-            lines.append(f"(AprilTag ID: {tid}, Pos ID: {pid}): {tool_name}")
-
-        if not lines:
-            lines = ["<no tools>"]
+        # the list re-renders itself whenever the tool/position maps change (and only then)
+        self.tool_list_view = RegistryView(self.controller.registry, self.tool_list_text, self._render_tool_list)
 
-        self.tool_list_text.configure(text="\n".join(lines))
+    def _render_tool_list(self, registry):
+        self.tool_list_text.configure(text=registry.tool_lines())
 
     def _display_feedback(self, msg: str, ok: bool = True):
         color = "#A4E8A2" if ok else "#FF8A80"
@@ -345,11 +325,9 @@ class PreparationPage(BasePage):
                 while pos_id in used:
                     pos_id += 1
 
-        # saving the tool's position id
+        # saving the tool's position id (the tool list view picks this up by itself)
         self.controller.shared_data["pos"][tool_id] = pos_id
 
-        self._render_tool_list()
-
         self.new_tool.delete(0, "end")
         self.new_tool_id.delete(0, "end")
         self.new_pos_id.delete(0, "end")
@@ -384,7 +362,6 @@ class PreparationPage(BasePage):
             self.feedback.configure(text="There is no tool with said ID", text_color="#FF6666")
             return
 
-        self._render_tool_list()
         self.remove_tool.delete(0, "end")
         self.feedback.configure(text=f"Removed '{removed_name}' (ID {tool_id})", text_color="#66FF66")
 
@@ -456,8 +433,8 @@ class PreparationPage(BasePage):
         
         exposure = -16 + (exposure_percent * 0.16)
 
-        # Change cap object
-        cap.set(cv2.CAP_PROP_EXPOSURE, float(exposure))
+        # Change camera exposure
+        self.controller.camera.set(cv2.CAP_PROP_EXPOSURE, float(exposure))
 
         # update shared data
         self.controller.shared_data["exposure"] = exposure
@@ -480,69 +457,20 @@ class PreparationPage(BasePage):
 
     # Called whenever this page is shown, which works well for displaying the camera
     def tkraise(self, aboveThis=None):
-        self.stop_camera = False
-        self.update_video()
+        self.scheduler.start()
         super().tkraise(aboveThis)
 
     def update_video(self):
-        if self.stop_camera:
-            return
-    
-        ret, frame = cap.read()
-        if ret:
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            tags = CONSTANTS.detector.detect(gray)
-
-            for tag in tags:
-                corners = tag.corners.astype(np.float32)
-                # Pose estimation
-                success, rvec, tvec = cv2.solvePnP(
-                    obj_points, corners, camera_matrix, dist_coeffs
-                )
-                if not success:
-                    continue  # Skip if pose estimation failed
-
-                if success:
-                    cv2.drawFrameAxes(frame, 
-                                    camera_matrix, 
-                                    dist_coeffs, 
-                                    rvec, 
-                                    tvec, 
-                                    0.02)
-
-                    # Display tag info
-                    tm = helpers.get_tmap(self.controller)
-                    tool_name = tm.get(tag.tag_id, f"Unknown Tool {tag.tag_id}") # Unknown/Unmapped IDs will naturally be April IDs
-                    id_display = tag.tag_id
-
-                    # Checking if the April Mode is on
-                    if self.controller.shared_data["show_april_mode"]:
-                        helping_text = "April_ID"
-                    else:
-                        helping_text = "Position_ID"
-                        pm = helpers.get_pmap(self.controller)
-                        id_display = pm.get(tag.tag_id, "N/A")
-
-                    cv2.putText(frame, 
-                                f"{tool_name} ({helping_text}: {id_display}) pos: x={tvec[0][0]:.3f}, y={tvec[1][0]:.3f}, z={tvec[2][0]:.3f}",
-                                (int(tag.corners[0][0]), int(tag.corners[0][1]) - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 
-                                0.5, 
-                                (255, 100, 0), 
-                                2)
-
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(frame_rgb)
-            img = img.resize((640, 480))  # optional resize
-            self.imgtk = ctk.CTkImage(light_image=img, size=(640, 480))
-            self.camera_label.configure(image=self.imgtk)
-
-        self.after(15, self.update_video)
+        # capture/detect/pose/draw all happen on the frame bus' pipeline threads, we only show the result
+        packet = self.feed.latest()
+        if packet is None or packet.image is None:
+            return False  # nothing new this tick
+        return self.preview.show(packet.image)
     
     # Hiding the camera upon exiting this page
     def on_hide(self):
         # Stop webcam loop when page is hidden
-        self.stop_camera = True
+        self.scheduler.stop()
 
     def login(self):
         self.controller.show_frame("DashboardPage")
@@ -562,13 +490,12 @@ class DashboardPage(BasePage):
                     storage_limit=self.controller.shared_data["storage"]
                     )
         
-        # Initialize tag history for velocity calculations
-        self.tag_hist = defaultdict(lambda: deque(maxlen=10))
-        
-        # Store current velocities for visible tags
-        self.current_velocities = {}
+        # Velocities come from the tracker (tracker.ToolTracker), this page only shows them
+        self.tracker = self.controller.tracker
         self.selected_velocity_tag = None          # which tag’s velocity to show live
-        self.velocity_updated_at = {}              # tid -> last v,w update time (seconds)
+        self.velocity_sub = None                   # tracker pushes that tag's updates...
+        self._velocity_lock = threading.Lock()
+        self._velocity_latest = None               # ...into here (newest only), the scheduler shows them
         
         # UI: Cutting up the screen (dimensioning)
         for i in range(14):
@@ -614,6 +541,10 @@ class DashboardPage(BasePage):
         self.panel_title = ctk.CTkLabel(self.panel, text="Dashboard Panel", font=("TkDefaultFont", 16, "bold"))
         self.panel_title.pack(pady=(8, 6))
 
+        # Active detector profile + its stats (only filled in when adaptive tuning is on)
+        self.detector_status = ctk.CTkLabel(self.panel, text="", font=("TkDefaultFont", 11))
+        self.detector_status.pack(pady=(0, 4))
+
         self.emergency_stop = ctk.CTkFrame(self, fg_color="#FF0000")  # same color as before
         self.emergency_stop.grid(row=2, column=8, rowspan=2, columnspan=3, sticky="nsew", padx=10, pady=10)
 
@@ -678,33 +609,34 @@ class DashboardPage(BasePage):
 
         # Camera Time! (6x8 tiles covered up)
         # DISPLAY RESOLUTION: 4x3
-        self.camera_label = ctk.CTkLabel(self, anchor="center", text="")
+        self.camera_label = preview_label(self, anchor="center")
         self.camera_label.grid(row=0, column=0, rowspan=6, columnspan=8, sticky="nsew", padx=40, pady=40)
 
-        self.stop_camera = True  # Start stopped
         self.current_image = None
 
         # Bind resize event
+        self.preview = PreviewRenderer(self.camera_label)
         self.camera_label.bind("<Configure>", self.on_resize)
 
-        # Start update loop in thread
-        self.update_thread = threading.Thread(target=self.update_video, daemon=True)
-        self.update_thread.start()
-
-    def _render_dshb_tool_list(self):
-        tm = helpers.get_tmap(self.controller)
-        pm = helpers.get_pmap(self.controller)
+        # Worker threads (on the shared frame bus) do the vision work; update_video (Tk thread)
+        # only consumes results. Velocity wants every solved frame, not just the newest.
+        self.feed = self.controller.frame_bus.subscribe(self, {"preview", "velocity"})
+        self.pipeline = self.tracker.pipeline
 
-        lines = []
-        for tid in sorted(tm.keys()):
-            tool_name = tm[tid]
-            pid = pm.get(tid, "<no pos>")
-            lines.append(f"(AprilTag ID: {tid}, Pos ID: {pid}): {tool_name}")
+        # Preview, velocity panel and status line each tick at their own rate (detection and
+        # pose rates live in the pipeline); nothing runs until the page is shown. The velocity
+        # panel only redraws when the tracker pushed something new.
+        self.scheduler = Scheduler(self)
+        self.scheduler.every("preview", CONSTANTS.PREVIEW_FPS, self.update_video)
+        self.scheduler.every("velocity", self._velocity_hz(), self._show_velocity)
+        self.scheduler.every("status", CONSTANTS.STATUS_HZ, self._update_detector_status)
 
-        if not lines:
-            lines = ["<no tools>"]
+        # Available tools list: redrawn when the registry changes, not every frame
+        self.tool_list_view = RegistryView(self.controller.registry, self.available_list_frame_text,
+                                           self._render_dshb_tool_list)
 
-        self.available_list_frame_text.configure(text="\n".join(lines))
+    def _render_dshb_tool_list(self, registry):
+        self.available_list_frame_text.configure(text=registry.tool_lines())
 
     def _panel_clear(self):
         for w in self.panel_body.winfo_children():
@@ -840,128 +772,76 @@ class DashboardPage(BasePage):
             self.velocity_tag_id.pack(anchor="w", pady=(0, 12))
 
         # Create button to check velocity
-        ctk.CTkButton(parent, text="Check Velocity", command=lambda: self.retrieve_velocity(reiteration=False)).pack(anchor="w", pady=(0, 12))
+        ctk.CTkButton(parent, text="Check Velocity", command=self.retrieve_velocity).pack(anchor="w", pady=(0, 12))
         ctk.CTkButton(parent, text="Stop Tracking", command=lambda: self._stop_velocity_follow()).pack(anchor="w", pady=(0, 12))
 
-    # Velocity Calculation (ahhh trig)
-    def rvec_to_R(self, rvec):
-        R, _ = cv2.Rodrigues(rvec)
-        return R
-
-    def calc_angular_velocity(self, R_prev, R_cur, dt):
-        """
-        Approx angular velocity (rad/s) using matrix log of relative rotation.
-        omega_vec points along rotation axis, magnitude = angular speed.
-        """
-        R_delta = R_cur @ R_prev.T
-        # clamp numerical errors
-        tr = np.clip((np.trace(R_delta) - 1) / 2.0, -1.0, 1.0)
-        angle = np.arccos(tr)
-        if dt <= 1e-6 or angle < 1e-6:
-            return np.zeros(3)
-        # rotation axis from skew-symmetric part
-        w = (R_delta - R_delta.T) / (2*np.sin(angle))
-        axis = np.array([w[2,1], w[0,2], w[1,0]])  # (wx, wy, wz)
-        return axis * (angle / dt)  # rad/s
-
-    def organize_velocity_data(self, tag_id: int, rvec, tvec):
-        """
-        Returns (linear_vel_mps[3], angular_vel_radps[3]) in the camera frame.
-        Units assume your obj_points are in meters -> tvec is meters.
-        """
-        now = time.time()
-        R = self.rvec_to_R(rvec)
-        hist = self.tag_hist[tag_id]
-
-        # If we have a previous sample, compute finite differences
-        if len(hist) > 0:
-            t_prev, p_prev, R_prev = hist[-1]
-            dt = now - t_prev
-            if dt > 1e-3:
-                v = (tvec.reshape(3) - p_prev) / dt                    # m/s in camera frame
-                w = self.calc_angular_velocity(R_prev, R, dt)          # rad/s
-                # Debug: print velocity when it's non-zero
-                if np.linalg.norm(v) > 0.001:  # Only print if velocity > 1mm/s
-                    print(f"Tag {tag_id}: v={v}, w={w}, dt={dt:.3f}s")
-            else:
-                v = np.zeros(3); w = np.zeros(3)
-        else:
-            v = np.zeros(3); w = np.zeros(3)
+    def retrieve_velocity(self):
+        # Follow the velocity of the tag in the entry box (replaces whatever was followed before)
+        tm = helpers.get_tmap(self.controller)
+        tag_id_input = self.velocity_tag_id.get().strip()
 
-        # push current sample
-        hist.append((now, tvec.reshape(3), R))
-        
-        # Store current velocity for this tag
-        self.current_velocities[tag_id] = (v, w)
-        self.velocity_updated_at[tag_id] = now
-
-    def _seen_within_ms(self, tag_id: int, limit_ms: int) -> bool:
-        ts = self.velocity_updated_at.get(tag_id)   # seconds
-        if ts is None:
-            return False
-        age_ms = (time.time() - ts) * 1000.0        # -> ms
-        # print(f"age_ms: {age_ms}")
-        return age_ms <= float(limit_ms)
-
-    def retrieve_velocity(self, reiteration):
-        # Display velocity for a specific tag using current velocity data
-        # Cancel Tracking case
-        if reiteration and self.selected_velocity_tag is None:
+        # Checking for silly goober IDs
+        if not tag_id_input:
+            self.current_tool.configure(text="Please enter a tag ID")
             return
 
-        tm = helpers.get_tmap(self.controller)
-        # Hard stop (initial check)
-        if not reiteration:
-            tag_id_input = self.velocity_tag_id.get().strip()
-            
-            # Checking for silly goober IDs
-            if not tag_id_input:
-                self.current_tool.configure(text="Please enter a tag ID")
-                return
-                
-            try:
-                tag_id = int(tag_id_input)
-            except ValueError:
-                self.current_tool.configure(text="Tag ID must be a number")
-                return
-            
-            # Check if tag exists in tool map
-            if tag_id not in tm:
-                self.current_tool.configure(text=f"Tag ID {tag_id} not found in tool map")
-                return
-            
-            # Tracking purposes
-            self.selected_velocity_tag = tag_id
-
-            # Check if we have current velocity data for this tag
-            if tag_id not in self.current_velocities:
-                tool_name = tm[tag_id]
-                self.current_tool.configure(text=f"{tool_name} (ID: {tag_id})\nNo velocity data available yet")
-                self.current_tool.after(self.controller.shared_data['velocity_refresh_rate'], lambda: self.retrieve_velocity(True))
-                return
-
-        # Check if tag is currently visible on screen (and check for coasting)
-        allow_coast = self._seen_within_ms(self.selected_velocity_tag, CONSTANTS.LAST_SEEN_LIMIT)
-        if (self.selected_velocity_tag not in self.visible_ids) and (not allow_coast):
-            tool_name = tm[self.selected_velocity_tag]
-            self.current_tool.configure(
-                text=f"{tool_name} (ID: {self.selected_velocity_tag})\nTag not visible recently (> {CONSTANTS.LAST_SEEN_LIMIT} ms)"
-            )
-            self.current_tool.after(self.controller.shared_data['velocity_refresh_rate'], lambda: self.retrieve_velocity(True))
+        try:
+            tag_id = int(tag_id_input)
+        except ValueError:
+            self.current_tool.configure(text="Tag ID must be a number")
             return
-        # Freeze the current velocity (assumption) until camera picks up on it again
-        elif (self.selected_velocity_tag not in self.visible_ids) and allow_coast:
-            self.display_velocity_data(self.selected_velocity_tag, self.past_v, self.past_w)
-            self.current_tool.after(self.controller.shared_data['velocity_refresh_rate'], lambda: self.retrieve_velocity(True))
+
+        # Check if tag exists in tool map
+        if tag_id not in tm:
+            self.current_tool.configure(text=f"Tag ID {tag_id} not found in tool map")
             return
 
-        # Get current velocity data and display it
-        v, w = self.current_velocities[self.selected_velocity_tag]
-        self.past_v, self.past_w = v, w
+        # Tracking purposes
+        self.selected_velocity_tag = tag_id
+        self._follow_velocity()
+
+        # The tracker pushes the first update as soon as it has one
+        if self.tracker.velocity(tag_id) is None:
+            self.current_tool.configure(text=f"{tm[tag_id]} (ID: {tag_id})\nNo velocity data available yet")
+
+    def _follow_velocity(self):
+        # (Re)subscribe to the selected tag: one subscription at most, however often the button is hit
+        self._unfollow_velocity()
+        if self.selected_velocity_tag is not None:
+            self.velocity_sub = self.tracker.subscribe_velocity(self.selected_velocity_tag, self._on_velocity,
+                                                                hz=self._velocity_hz())
+
+    def _unfollow_velocity(self):
+        if self.velocity_sub is not None:
+            self.velocity_sub.close()
+            self.velocity_sub = None
+        with self._velocity_lock:
+            self._velocity_latest = None
+
+    def _on_velocity(self, state):
+        # Tracker thread: no Tk in here, just leave the newest state for _show_velocity
+        with self._velocity_lock:
+            self._velocity_latest = state
+
+    def _show_velocity(self):
+        # Velocity panel (scheduler task, Tk thread); idle until the tracker pushed something new
+        with self._velocity_lock:
+            state, self._velocity_latest = self._velocity_latest, None
+        if state is None or state.tag_id != self.selected_velocity_tag:
+            return False  # nothing new / pushed before the follow was changed
+
+        # Visible, or out of sight but still coasting on the tracker's prediction (until the
+        # filter gets too unsure of where it is); predicted to when it was pushed
+        if not state.tracked:
+            tool_name = helpers.get_tmap(self.controller).get(state.tag_id, f"Unknown Tool {state.tag_id}")
+            self.current_tool.configure(text=f"{tool_name} (ID: {state.tag_id})\nTag lost")
+            return
 
-        self.display_velocity_data(self.selected_velocity_tag, v, w)
-        self.current_tool.after(self.controller.shared_data['velocity_refresh_rate'], lambda: self.retrieve_velocity(True))
+        self.display_velocity_data(state.tag_id, state.linear_velocity, state.angular_velocity)
 
+    def _velocity_hz(self):
+        # the Settings page stores the panel rate as a refresh period in ms
+        return 1000.0 / self.controller.shared_data["velocity_refresh_rate"]
 
     def display_velocity_data(self, tag_id: int, v: np.ndarray, w: np.ndarray):
         # Check if tag exists in tool map
@@ -986,100 +866,55 @@ class DashboardPage(BasePage):
 
     def _stop_velocity_follow(self):
         self.selected_velocity_tag = None
+        self._unfollow_velocity()
         self.current_tool.configure(text="Velocity tracking cleared.")
 
     # MAIN DASHBOARD FUNCTIONS
     
     def on_resize(self, event):
         # Handle window resize and update image to match new label size
+        # (the preview only re-allocates its buffers when this actually changes)
         self.label_width = event.width
         self.label_height = event.height
+        self.preview.set_target(event.width, event.height)
 
     def tkraise(self, aboveThis=None):
-        self.stop_camera = False
-        self.update_video()
+        # the velocity rate may have been changed on the Settings page
+        hz = self._velocity_hz()
+        self.scheduler.set_rate("velocity", hz)
+        if self.velocity_sub is not None:
+            self.velocity_sub.set_rate(hz)
+        self.scheduler.start()
         super().tkraise(aboveThis)
 
     def update_video(self): # Primary use is to update video, used for other things also
-        self._render_dshb_tool_list() # Used here to refresh the available tools
-
-        if self.stop_camera:
-            return
-
-        ret, frame = cap.read()
-        if ret:
-            # Convert BGR to RGB
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            tags = CONSTANTS.detector.detect(gray)
-
-            # Keep track of seen tags
-            current_seen = set()
-
-            for tag in tags:
-                tid = int(tag.tag_id)
-                current_seen.add(tid)
-
-                corners = tag.corners.astype(np.float32)
-                # Pose estimation
-                success, rvec, tvec = cv2.solvePnP(
-                    obj_points, corners, camera_matrix, dist_coeffs
-                )
-                if not success:
-                    continue  # Skip if pose estimation failed
-
-                if success:
-
-                    cv2.drawFrameAxes(frame, 
-                                    camera_matrix, 
-                                    dist_coeffs, 
-                                    rvec, 
-                                    tvec, 
-                                    0.02)
-
-                    # VELOCITY
-                    self.organize_velocity_data(tid, rvec, tvec)
-
-                    # Display tag info
-                    tm = helpers.get_tmap(self.controller)
-                    tool_name = tm.get(tag.tag_id, f"Unknown Tool {tag.tag_id}") # Unknown/Unmapped IDs will naturally be April IDs
-                    id_display = tag.tag_id
-
-                    # Checking if the April Mode is on
-                    if self.controller.shared_data["show_april_mode"]:
-                        helping_text = "April_ID"
-                    else:
-                        helping_text = "Position_ID"
-                        pm = helpers.get_pmap(self.controller)
-                        id_display = pm.get(tag.tag_id, "N/A")
-
-                    cv2.putText(frame, 
-                                f"{tool_name} ({helping_text}: {id_display}) pos: x={tvec[0][0]:.3f}, y={tvec[1][0]:.3f}, z={tvec[2][0]:.3f}",
-                                (int(tag.corners[0][0]), int(tag.corners[0][1]) - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 
-                                0.5, 
-                                (255, 100, 0), 
-                                2)
-
-            self.visible_ids = current_seen
-
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(frame_rgb)
-
-            # Wait until label is laid out
-            if hasattr(self, "label_width") and hasattr(self, "label_height"):
-                resized_img = helpers.resize_to_fit_4_3(img, self.label_width, self.label_height)
-                self.imgtk = ctk.CTkImage(light_image=resized_img, size=resized_img.size)
-                self.camera_label.configure(image=self.imgtk)
-
-            # Update label image
-            self.camera_label.configure(image=self.imgtk)
-
-        # Schedule next frame update ~60 FPS
-        self.camera_label.after(15, self.update_video)
+        # Finished frames only: detection, pose, drawing and PIL conversion ran on the pipeline threads
+        # (velocity is estimated by the tracker as packets come through, not here)
+        packet = self.feed.latest()
+        if packet is None:
+            return False  # nothing new this tick
+
+        # Keep track of seen tags
+        self.visible_ids = packet.seen_ids
+
+        if packet.image is not None:
+            self.preview.show(packet.image)
+
+    def _update_detector_status(self):
+        # Stats change every frame, the scheduler only runs this STATUS_HZ times a second
+        summary = getattr(self.pipeline.detector, "summary", None)
+        lines = [summary()] if summary is not None else []
+        lines.append(self.pipeline.latency_summary())
+        lines.append(self.pipeline.timing_summary())
+        # pipeline stages first, so "velocity" is the panel's refresh rate rather than the stage's
+        rates = dict(self.pipeline.rates)
+        rates.update(self.scheduler.rates)
+        lines.append(format_rates(rates, ["preview", "detect", "pose", "velocity"]))
+        self.detector_status.configure(text="\n".join(line for line in lines if line))
 
     def on_hide(self):
-        # Stop webcam loop when page is hidden
-        self.stop_camera = True
+        # Stop webcam loop when page is hidden (velocity pushes just overwrite one slot meanwhile)
+        self.scheduler.stop()
 
 
 # App Controller
@@ -1096,7 +931,17 @@ class App(ctk.CTk):
         self.container.grid_rowconfigure(0, weight=1)
         self.container.grid_columnconfigure(0, weight=1)
 
-        self.shared_data = {}
+        # Camera is read on its own thread; pages pull the newest frame from it
+        self.camera = CameraStream(0, capture_format=CONSTANTS.CAPTURE_FORMAT).start()
+        # Optional multi-process detection backend, shared by both pages (only one runs at a time)
+        self.detect_pool = None
+        if CONSTANTS.DETECT_POOL:
+            self.detect_pool = DetectorPool(CONSTANTS.DETECT_POOL_PARAMS, workers=CONSTANTS.DETECT_POOL_WORKERS,
+                                            tiles=CONSTANTS.DETECT_POOL_TILES)
+
+        # Tool/position maps live in an observable registry; shared_data keeps pointing at them
+        self.registry = ToolRegistry()
+        self.shared_data = {"tool_map": self.registry.tools, "pos": self.registry.positions}
         # storage
         # tool_map
         # exposure
@@ -1105,6 +950,14 @@ class App(ctk.CTk):
         # pos
         # velocity_refresh_rate (in ms)
 
+        # Tracking runs headless-style in the tracker (capture -> detect -> pose -> velocity);
+        # the pages are clients of it through the frame bus
+        self.tracker = ToolTracker(self.camera, self.registry, solver=load_pose_solver(),
+                                   detector=make_detector(self.detect_pool), describe=self._describe_tag,
+                                   overlay=self._make_overlay(), detect_hz=CONSTANTS.DETECT_FPS,
+                                   pose_hz=CONSTANTS.POSE_FPS, debug=True)
+        self.frame_bus = FrameBus(self.tracker)
+
         # Load page frames into self.container
         self.frames = {}
         for PageClass in (PreparationPage, DashboardPage):
@@ -1114,16 +967,42 @@ class App(ctk.CTk):
             frame.grid(row=0, column=0, sticky="nsew")
 
         self.show_frame("PreparationPage")
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+    # Label pieces for a tag (runs on the pipeline's annotate thread, so no widget access here)
+    def _describe_tag(self, tag_id):
+        tm = helpers.get_tmap(self)
+        tool_name = tm.get(tag_id, f"Unknown Tool {tag_id}") # Unknown/Unmapped IDs will naturally be April IDs
+        id_display = tag_id
+
+        # Checking if the April Mode is on
+        if self.shared_data["show_april_mode"]:
+            helping_text = "April_ID"
+        else:
+            helping_text = "Position_ID"
+            pm = helpers.get_pmap(self)
+            id_display = pm.get(tag_id, "N/A")
+        return tool_name, helping_text, id_display
+
+    def _make_overlay(self):
+        return OverlayCompositor(numeric_hz=CONSTANTS.OVERLAY_NUMERIC_HZ, enabled=CONSTANTS.OVERLAY)
 
     def show_frame(self, name):
         for frame in self.frames.values():
             if hasattr(frame, "on_hide"):
                 frame.on_hide()
         frame = self.frames[name]
+        # only the page on screen gets frames (and the pipeline only runs what it needs)
+        self.frame_bus.show(frame)
         frame.tkraise()
 
     def on_closing(self):
-        cap.release()
+        for frame in self.frames.values():
+            frame.on_hide()
+        self.frame_bus.close()
+        if self.detect_pool is not None:
+            self.detect_pool.close()
+        self.camera.release()
         self.destroy()
 
 if __name__ == "__main__":
@@ -0,0 +1,239 @@
+import multiprocessing as mp
+import os
+import queue
+import threading
+from collections import deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from detector_tuning import get_detector
+from roi_tracker import shift_detection
+
+
+def _worker(detector_params, slot_names, tasks, results):
+    # One detector per process; frames are read straight out of the shared slots
+    detector = get_detector(**detector_params)
+    shms = [shared_memory.SharedMemory(name=name) for name in slot_names]
+
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            ticket, slot, (h, w), (x0, y0, x1, y1) = task
+            image = np.ndarray((h, w), dtype=np.uint8, buffer=shms[slot].buf)[y0:y1, x0:x1]
+            try:
+                tags = detector.detect(image)
+            except Exception as e:
+                print(f"Detection error (worker {os.getpid()}): {e}")
+                tags = []
+            for tag in tags:
+                shift_detection(tag, x0, y0)
+            results.put((ticket, tags))
+    finally:
+        for shm in shms:
+            shm.close()
+
+
+class DetectorPool:
+    """
+    Optional detection backend: frames go out to a pool of worker PROCESSES, each with its
+    own pupil_apriltags Detector, so detection isn't limited to one core / the GIL.
+
+    Frames travel through shared memory slots (one copy in, no pickling of pixels); only the
+    small Detection objects are pickled back. Results come out in the order frames went in.
+    With tiles=(rows, cols) each frame is also cut into overlapping tiles that run on
+    different workers, which helps when a single high-res frame is too slow for one core
+    (tile_overlap has to be bigger than the largest tag, in px).
+
+    Async:  submit(gray, item) ... get() -> (item, tags)   (what TagPipeline uses)
+    Sync:   detect(gray) -> tags                           (drop-in for a Detector)
+    Don't mix the two on the same pool.
+    """
+
+    def __init__(self, detector_params, workers=None, max_shape=(1080, 1920), slots=None,
+                 tiles=(1, 1), tile_overlap=96):
+        self.detector_params = dict(detector_params)
+        self.workers = workers or max(os.cpu_count() - 1, 1)
+        self.max_shape = max_shape
+        self.n_slots = slots or 2 * self.workers
+        self.tiles = tiles
+        self.tile_overlap = tile_overlap
+
+        self._ctx = mp.get_context("spawn")
+        self._shms = []
+        self._slots = []            # numpy views of the shared segments
+        self._procs = []
+        self._tasks = None
+        self._results = None
+        self._collector = None
+        self._running = False
+
+        self._free = queue.Queue()  # slot indices nobody is using
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._ticket = 0            # next ticket handed out by submit()
+        self._next = 0              # next ticket to hand back from get()
+        self._pending = {}          # ticket -> [item, slot, tiles left, tags, generation]
+        self._done = deque()        # (item, tags) in submission order
+        self._generation = 0
+        self.on_discard = None      # on_discard(item) for every item drain() throws away
+
+        self.dropped = 0            # frames refused because every slot was busy
+        self.frames = 0
+
+    # --- lifecycle ---
+
+    def start(self):
+        if self._running:
+            return self
+        size = self.max_shape[0] * self.max_shape[1]
+        self._free = queue.Queue()
+        self._pending.clear()
+        self._done.clear()
+        self._ticket = self._next = 0
+        for i in range(self.n_slots):
+            shm = shared_memory.SharedMemory(create=True, size=size)
+            self._shms.append(shm)
+            self._slots.append(np.ndarray((size,), dtype=np.uint8, buffer=shm.buf))
+            self._free.put(i)
+
+        self._tasks = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        names = [shm.name for shm in self._shms]
+        for i in range(self.workers):
+            p = self._ctx.Process(target=_worker, args=(self.detector_params, names, self._tasks, self._results),
+                                  name=f"detect-pool-{i}", daemon=True)
+            p.start()
+            self._procs.append(p)
+
+        self._running = True
+        self._collector = threading.Thread(target=self._collect, name="detect-pool-collector", daemon=True)
+        self._collector.start()
+        return self
+
+    def close(self):
+        if not self._running:
+            return
+        self._running = False
+        for _ in self._procs:
+            self._tasks.put(None)
+        for p in self._procs:
+            p.join(timeout=2.0)
+            if p.is_alive():
+                p.terminate()
+        self._collector.join(timeout=1.0)
+        with self._lock:
+            self._ready.notify_all()
+        self._slots = []
+        for shm in self._shms:
+            shm.close()
+            shm.unlink()
+        self._shms = []
+        self._procs = []
+
+    def drain(self):
+        # Forget everything in flight (e.g. a pipeline restarting); late results get thrown away
+        with self._lock:
+            self._generation += 1
+            stale = [item for item, _ in self._done]
+            self._done.clear()
+        if self.on_discard is not None:
+            for item in stale:
+                self.on_discard(item)
+
+    # --- async API ---
+
+    def submit(self, gray, item=None, timeout=0.1):
+        """
+        Copies `gray` into a free slot and queues it (all its tiles) for the workers.
+        Returns False (and counts a drop) if no slot frees up within `timeout`.
+        """
+        h, w = gray.shape[:2]
+        if h * w > self.max_shape[0] * self.max_shape[1]:
+            raise ValueError(f"Frame {w}x{h} is bigger than the pool's max_shape {self.max_shape}")
+        try:
+            slot = self._free.get(timeout=timeout)
+        except queue.Empty:
+            self.dropped += 1
+            return False
+
+        np.copyto(self._slots[slot][:h * w].reshape(h, w), gray)
+        regions = self._tiles_for(w, h)
+        with self._lock:
+            ticket = self._ticket
+            self._ticket += 1
+            self._pending[ticket] = [item, slot, len(regions), [], self._generation]
+        for region in regions:
+            self._tasks.put((ticket, slot, (h, w), region))
+        self.frames += 1
+        return True
+
+    def get(self, timeout=None):
+        # Next finished (item, tags) in submission order, or None on timeout
+        with self._lock:
+            self._ready.wait_for(lambda: self._done or not self._running, timeout)
+            return self._done.popleft() if self._done else None
+
+    # --- sync API ---
+
+    def detect(self, gray):
+        self.submit(gray, item=gray, timeout=None)
+        while self._running:
+            result = self.get(timeout=0.5)
+            if result is not None and result[0] is gray:
+                return result[1]
+        return []
+
+    # --- internals ---
+
+    def _tiles_for(self, w, h):
+        rows, cols = self.tiles
+        if rows * cols <= 1:
+            return [(0, 0, w, h)]
+        pad = self.tile_overlap // 2
+        regions = []
+        for r in range(rows):
+            for c in range(cols):
+                x0, x1 = w * c // cols, w * (c + 1) // cols
+                y0, y1 = h * r // rows, h * (r + 1) // rows
+                regions.append((max(x0 - pad, 0), max(y0 - pad, 0), min(x1 + pad, w), min(y1 + pad, h)))
+        return regions
+
+    def _collect(self):
+        while self._running:
+            try:
+                ticket, tags = self._results.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            with self._lock:
+                entry = self._pending[ticket]
+                entry[3].extend(tags)
+                entry[2] -= 1
+                if entry[2] > 0:
+                    continue
+                self._free.put(entry[1])  # all tiles read, slot can be reused
+                # hand back finished tickets in order; a late one holds the ones behind it
+                stale = []
+                while self._next in self._pending and self._pending[self._next][2] == 0:
+                    item, _, _, found, generation = self._pending.pop(self._next)
+                    self._next += 1
+                    if generation == self._generation:
+                        self._done.append((item, _merge_tiles(found)))
+                    else:
+                        stale.append(item)
+                self._ready.notify_all()
+            if self.on_discard is not None:
+                for item in stale:
+                    self.on_discard(item)
+
+
+def _merge_tiles(tags):
+    # A tag inside a tile overlap is found twice; keep the better decode
+    best = {}
+    for tag in tags:
+        tid = int(tag.tag_id)
+        if tid not in best or tag.decision_margin > best[tid].decision_margin:
+            best[tid] = tag
+    return list(best.values())
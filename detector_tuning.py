@@ -0,0 +1,169 @@
+import time
+
+import numpy as np
+from pupil_apriltags import Detector
+
+from roi_tracker import in_view
+
+# pupil_apriltags can corrupt the heap when a Detector that has already decoded tags is
+# destroyed, so every parameter set gets built once and kept for the life of the process
+# (this also lets both pages' tuners share the same detectors)
+_detectors = {}
+
+
+def get_detector(**params):
+    key = tuple(sorted(params.items()))
+    if key not in _detectors:
+        _detectors[key] = Detector(**params)
+    return _detectors[key]
+
+
+class DetectorTuner:
+    """
+    Runtime controller for the AprilTag detector. Every profile in CONSTANTS.DETECTOR_PROFILES
+    gets its own pre-built Detector, and we hop between them based on what we measure:
+      - per-frame detection latency (full-frame scans are what has to fit the budget)
+      - apparent tag size in px (smallest visible tag; fast profiles miss small/far tags)
+      - success rate (did we find the tags we saw last frame that are still well inside the
+        view? A tag leaving the view isn't a miss; with a RoiTracker, its track losses)
+
+    Drop-in for the detector (tuner.detect(gray, at=None)). If a RoiTracker is passed in, the
+    tuner drives it and swaps the tracker's detector instead of detecting directly. `at` (the
+    frame's capture time) is passed through to the tracker's crop prediction.
+    """
+
+    def __init__(self, profiles, budget_ms, base_params, tracker=None, start="speed",
+                 decide_every=10, cooldown=30, alpha=0.2):
+        self.profiles = []
+        for p in profiles:
+            p = dict(p)
+            p["detector"] = get_detector(**base_params, **p["params"])
+            p["latency_ms"] = None  # last known full-scan latency while this profile was active
+            self.profiles.append(p)
+
+        names = [p["name"] for p in self.profiles]
+        self.index = names.index(start) if start in names else len(self.profiles) - 1
+        self.budget_ms = budget_ms
+        self.tracker = tracker
+        self.decide_every = decide_every
+        self.cooldown = cooldown      # frames to wait after a switch before judging the new profile
+        self.alpha = alpha            # EMA weight
+
+        # measured stats (EMAs)
+        self.latency_ms = 0.0         # every frame (ROI frames included)
+        self.full_latency_ms = 0.0    # full-frame scans only
+        self.min_tag_px = None        # smallest visible tag side
+        self.success_rate = 1.0
+        self._last_corners = {}       # tag_id -> corners from the previous frame (no RoiTracker)
+
+        self.frames = 0
+        self.switches = 0
+        self.last_reason = ""
+        self._since_switch = 0
+        self._use(self.index)
+
+    @property
+    def active(self):
+        return self.profiles[self.index]
+
+    def detect(self, gray, at=None):
+        t0 = time.perf_counter()
+        if self.tracker is not None:
+            tags = self.tracker.detect(gray, at)
+        else:
+            tags = self.active["detector"].detect(gray)
+        ms = (time.perf_counter() - t0) * 1000.0
+
+        full = self.tracker is None or self.tracker.last_mode == "full"
+        self._record(tags, ms, full, gray.shape[1], gray.shape[0])
+
+        self.frames += 1
+        self._since_switch += 1
+        if self._since_switch >= self.cooldown and self.frames % self.decide_every == 0:
+            self._decide()
+        return tags
+
+    def stats(self):
+        return {
+            "profile": self.active["name"],
+            "latency_ms": self.latency_ms,
+            "full_latency_ms": self.full_latency_ms,
+            "budget_ms": self.budget_ms,
+            "min_tag_px": self.min_tag_px,
+            "success_rate": self.success_rate,
+            "switches": self.switches,
+            "reason": self.last_reason,
+        }
+
+    def summary(self):
+        # one-liner for the dashboard
+        px = "--" if self.min_tag_px is None else f"{self.min_tag_px:.0f}"
+        return (f"Detector: {self.active['name']} | {self.full_latency_ms:.1f}/{self.budget_ms} ms"
+                f" | min tag {px} px | success {self.success_rate:.0%}")
+
+    # --- measuring ---
+
+    def _ema(self, old, new):
+        return new if old is None else old + self.alpha * (new - old)
+
+    def _record(self, tags, ms, full, w, h):
+        self.latency_ms = self._ema(self.latency_ms, ms)
+        if full:
+            self.full_latency_ms = self._ema(self.full_latency_ms, ms)
+            self.active["latency_ms"] = self.full_latency_ms
+
+        if tags:
+            corners = np.array([tag.corners for tag in tags])               # (N, 4, 2)
+            sides = np.linalg.norm(corners - np.roll(corners, 1, axis=1), axis=2)
+            self.min_tag_px = self._ema(self.min_tag_px, float(sides.min()))
+
+        if self.tracker is not None:
+            expected, lost = self.tracker.expected, self.tracker.lost
+        else:
+            found = {int(tag.tag_id) for tag in tags}
+            expect = [tid for tid, corners in self._last_corners.items() if in_view(corners, w, h)]
+            expected, lost = len(expect), sum(tid not in found for tid in expect)
+            self._last_corners = {int(tag.tag_id): np.asarray(tag.corners) for tag in tags}
+        if expected:  # nothing to miss -> no evidence either way
+            self.success_rate = self._ema(self.success_rate, 1.0 - lost / expected)
+
+    # --- deciding ---
+
+    def _decide(self):
+        slower, faster = self.index - 1, self.index + 1
+        small = self.min_tag_px
+        lat = self.full_latency_ms
+
+        # losing tags, or the smallest tag is below what this profile can see -> more quality
+        if slower >= 0 and (self.success_rate < 0.8 or (small is not None and small < self.active["min_tag_px"])):
+            return self._switch(slower, "losing tags")
+
+        # over budget -> faster, but only if the smallest visible tag survives the switch
+        if lat > self.budget_ms and faster < len(self.profiles):
+            if small is None or small >= 1.2 * self.profiles[faster]["min_tag_px"]:
+                return self._switch(faster, "over budget")
+
+        # plenty of headroom -> back toward quality if it should still fit
+        if slower >= 0 and lat < 0.6 * self.budget_ms:
+            predicted = self.profiles[slower]["latency_ms"]
+            if predicted is None:
+                # detection cost scales roughly with decimated pixel count
+                ratio = self.active["params"]["quad_decimate"] / self.profiles[slower]["params"]["quad_decimate"]
+                predicted = lat * ratio * ratio
+            if predicted < 0.9 * self.budget_ms:
+                return self._switch(slower, "headroom")
+
+    def _switch(self, index, reason):
+        self.switches += 1
+        self.last_reason = reason
+        self._use(index)
+
+    def _use(self, index):
+        self.index = index
+        self._since_switch = 0
+        self.success_rate = 1.0
+        if self.active["latency_ms"] is not None:
+            self.full_latency_ms = self.active["latency_ms"]
+        if self.tracker is not None:
+            self.tracker.detector = self.active["detector"]
+            self.tracker.force_scan = True  # get a full-frame measurement on the new profile
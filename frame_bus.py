@@ -0,0 +1,122 @@
+from collections import deque
+
+# What a subscriber can ask for, and what each of those needs the pipeline to run
+#   "detect"   seen tag ids only
+#   "pose"     solved poses
+#   "velocity" every fresh pose packet (not just the newest), for finite differencing
+#   "preview"  annotated frames (labels + axes, so poses too)
+STAGE_DEPS = {
+    "detect": set(),
+    "pose": {"detect"},
+    "velocity": {"pose", "detect"},
+    "preview": {"pose", "detect"},
+}
+
+
+class Subscription:
+    # A page's handle on the bus; only delivers while its owner is the page on screen
+    def __init__(self, bus, owner, stages):
+        self.bus = bus
+        self.owner = owner
+        self.stages = set(stages)
+        self.active = False
+        self.seen = 0  # bus sequence number of the last packet handed to us
+
+    def packets(self):
+        # every packet that finished since the last call, oldest first (Tk thread)
+        return self.bus._since(self)
+
+    def latest(self):
+        # newest finished packet we haven't had yet, or None
+        packets = self.packets()
+        return packets[-1] if packets else None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class FrameBus:
+    """
+    The one place frames get captured and detected: a single tracker.ToolTracker (and so a
+    single TagPipeline) shared by all pages, so each camera frame is detected exactly once no
+    matter how many pages there are or how often they're switched.
+
+    Pages subscribe(owner, stages) once; show(page) (App.show_frame) activates that page's
+    subscriptions and deactivates everybody else's, so hidden pages stop receiving without
+    having to remember to. The pipeline only runs the stages the active subscriptions need
+    (e.g. no pose solving or velocity with nobody looking) and stops when nobody is subscribed.
+    Finished packets are kept in a short backlog so every subscriber sees every packet; the bus
+    owns them and releases each one (pooled buffers) as it falls out of the backlog, so a
+    subscriber uses a packet during its own tick and doesn't hold on to it.
+    Tk thread only.
+    """
+
+    def __init__(self, source, backlog=8):
+        self.source = source  # start/stop/configure/poll/running, i.e. a ToolTracker
+        self.subscriptions = []
+        self.backlog = backlog
+        self._backlog = deque()  # (seq, packet), oldest first
+        self._seq = 0
+        self.needed = set()
+
+    def subscribe(self, owner, stages):
+        unknown = set(stages) - set(STAGE_DEPS)
+        if unknown:
+            raise ValueError(f"Unknown frame bus stage(s): {sorted(unknown)}")
+        sub = Subscription(self, owner, stages)
+        self.subscriptions.append(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        if sub in self.subscriptions:
+            self.subscriptions.remove(sub)
+            self._reconfigure()
+
+    def show(self, owner):
+        # `owner` is now on screen: only its subscriptions receive
+        for sub in self.subscriptions:
+            sub.active = sub.owner is owner
+            if sub.active:
+                sub.seen = self._seq  # don't hand over packets from before it was shown
+        self._reconfigure()
+
+    def close(self):
+        for sub in self.subscriptions:
+            sub.active = False
+        self._reconfigure()
+        while self._backlog:
+            self._backlog.popleft()[1].release()
+
+    # --- internals ---
+
+    def _reconfigure(self):
+        needed = set()
+        for sub in self.subscriptions:
+            if sub.active:
+                for stage in sub.stages:
+                    needed |= {stage} | STAGE_DEPS[stage]
+        if not needed:
+            self.source.stop()
+        elif needed != self.needed or not self.source.running:
+            self.source.configure(pose="pose" in needed, overlay="preview" in needed,
+                                  velocity="velocity" in needed)
+            self.source.start()
+        self.needed = needed
+
+    def _pump(self):
+        while True:
+            packet = self.source.poll()
+            if packet is None:
+                return
+            self._seq += 1
+            self._backlog.append((self._seq, packet))
+            if len(self._backlog) > self.backlog:
+                self._backlog.popleft()[1].release()
+
+    def _since(self, sub):
+        if not sub.active:
+            return []
+        self._pump()
+        packets = [packet for seq, packet in self._backlog if seq > sub.seen]
+        sub.seen = self._seq
+        return packets
@@ -0,0 +1,99 @@
+import cv2
+import numpy as np
+
+
+def calibrated_size(data):
+    # (w, h) a calibration npz was done at (calibrate.py saves image_size), None for older ones
+    return tuple(int(v) for v in data["image_size"]) if "image_size" in data.files else None
+
+
+class CameraGeometry:
+    """
+    Calibration-aware geometry shared by pose solving and drawing.
+    The idea is to pay for the distortion model ONCE per frame instead of inside every
+    per-tag solvePnP / drawFrameAxes iteration:
+      - normalize(corners, size): pixels -> undistorted normalized coords for ALL corners at
+        once (one cv2.undistortPoints call per frame, not one per tag)
+      - project(points): camera-frame 3D points -> distorted pixels, vectorized
+      - undistort_image(frame): cached cv2.remap for an undistorted DISPLAY only,
+        pixels there are camera_matrix @ normalized coords (no distortion)
+
+    calibrated_size=(w, h) is the resolution the calibration was done at; frames at another
+    resolution get a scaled camera matrix. None = trust the calibration at any size
+    (calibrate.py saves it as image_size in the npz; older files don't have it).
+    """
+
+    def __init__(self, camera_matrix, dist_coeffs, calibrated_size=None):
+        self.camera_matrix = np.asarray(camera_matrix, dtype=np.float64)
+        self.dist_coeffs = np.asarray(dist_coeffs, dtype=np.float64).ravel()
+        self.calibrated_size = calibrated_size
+        self.zero_dist = np.zeros(5)
+        self._maps = {}     # (w, h) -> display remap
+
+    def matrix_for(self, size):
+        # camera matrix for frames of this (w, h)
+        if size is None or self.calibrated_size is None or tuple(size) == tuple(self.calibrated_size):
+            return self.camera_matrix
+        sx = size[0] / self.calibrated_size[0]
+        sy = size[1] / self.calibrated_size[1]
+        return np.diag([sx, sy, 1.0]) @ self.camera_matrix
+
+    # --- corners ---
+
+    def normalize(self, corners, size=None):
+        """
+        (..., 2) pixel coords -> (..., 2) undistorted normalized coords, every corner of the
+        frame in one cv2.undistortPoints call (size=(w, h) picks the camera matrix).
+        """
+        corners = np.asarray(corners, dtype=np.float64)
+        uv = cv2.undistortPoints(corners.reshape(-1, 1, 2), self.matrix_for(size), self.dist_coeffs)
+        return uv.reshape(corners.shape)
+
+    def to_pixels(self, uv, size=None):
+        # normalized coords -> pixels WITHOUT distortion (i.e. undistorted display coords)
+        K = self.matrix_for(size)
+        uv = np.asarray(uv, dtype=np.float64)
+        return uv * [K[0, 0], K[1, 1]] + [K[0, 2], K[1, 2]]
+
+    # --- projection ---
+
+    def project(self, points, size=None, distort=True):
+        """
+        (..., 3) points in the camera frame -> (..., 2) pixels, all at once.
+        Same Brown-Conrady model (k1, k2, p1, p2, k3) OpenCV calibrates with;
+        distort=False for drawing onto an undistorted display.
+        """
+        points = np.asarray(points, dtype=np.float64)
+        z = points[..., 2:3]
+        uv = points[..., :2] / np.where(np.abs(z) < 1e-9, 1e-9, z)
+        if distort:
+            uv = self._distort(uv)
+        return self.to_pixels(uv, size)
+
+    def _distort(self, uv):
+        if np.any(self.dist_coeffs[5:]):
+            # rational / thin prism models: let OpenCV do it
+            pts = np.concatenate([uv.reshape(-1, 2), np.ones((uv[..., 0].size, 1))], axis=1)
+            out, _ = cv2.projectPoints(pts, np.zeros(3), np.zeros(3), np.eye(3), self.dist_coeffs)
+            return out.reshape(uv.shape)
+        d = np.zeros(5)
+        d[:len(self.dist_coeffs)] = self.dist_coeffs
+        k1, k2, p1, p2, k3 = d
+        x, y = uv[..., 0], uv[..., 1]
+        r2 = x * x + y * y
+        radial = 1 + r2 * (k1 + r2 * (k2 + r2 * k3))
+        xd = x * radial + 2 * p1 * x * y + p2 * (r2 + 2 * x * x)
+        yd = y * radial + p1 * (r2 + 2 * y * y) + 2 * p2 * x * y
+        return np.stack([xd, yd], axis=-1)
+
+    # --- display ---
+
+    def undistort_image(self, image, dst=None):
+        # Display only: detection and pose always run on the raw frame (dst: reuse this array)
+        h, w = image.shape[:2]
+        maps = self._maps.get((w, h))
+        if maps is None:
+            K = self.matrix_for((w, h))
+            maps = cv2.initUndistortRectifyMap(K, self.dist_coeffs, None, K, (w, h), cv2.CV_16SC2)
+            self._maps[(w, h)] = maps
+        return cv2.remap(image, maps[0], maps[1], cv2.INTER_LINEAR, dst=dst)
@@ -0,0 +1,189 @@
+from collections import namedtuple
+
+import numpy as np
+
+from rotations import quat_conj, quat_exp, quat_log, quat_mul
+
+# Filtered (or predicted) state of K tags, batched:
+#   position (K, 3) m, quat (K, 4) unit (w, x, y, z), rvec (K, 3)
+#   linear_velocity (K, 3) m/s, angular_velocity (K, 3) rad/s (camera frame)
+#   position_cov / rotation_cov (K, 3, d, d): per-axis covariance of [value, rate(, accel)]
+#   position_std (K,) m / rotation_std (K,) rad: standard deviation of the worst axis
+FilteredPose = namedtuple("FilteredPose", ["t", "position", "quat", "rvec", "linear_velocity", "angular_velocity",
+                                           "position_cov", "rotation_cov", "position_std", "rotation_std"])
+
+
+class PoseFilter:
+    """
+    Kalman filter per tool over SE(3), batched over every tag: constant velocity (order=2)
+    or constant acceleration (order=3), driven by white noise on the highest derivative.
+
+    Translation is filtered per camera axis ([p, v(, a)] per axis, so every update is a
+    scalar one and needs no matrix inverse). Rotation is an error-state filter: a nominal
+    orientation quaternion plus a small rotation error and angular velocity (and
+    acceleration) per axis, the same per-axis filter. After each update the error is folded
+    back into the quaternion, so it never has to leave the small-angle regime.
+    Measurement noise is per axis (depth is much noisier than x/y for a small tag).
+
+    update(slots, t, positions, quats) takes one frame's worth of tags (slots as handed out
+    by kinematics.KinematicsStore) and predicts each one to t before correcting it;
+    predict(slots, t) extrapolates to any time without changing anything (latency
+    compensation, ROI prediction, coasting). Uncertainty grows while a tag isn't seen, so
+    callers can coast until position_std / rotation_std pass a limit instead of a fixed
+    timeout: a tag whose velocity was well known coasts longer than a jittery one.
+    A measurement further than `gate` (Mahalanobis, squared) from the prediction restarts
+    that tag's track (a wrong decode or a flipped pose shouldn't drag the filter along).
+    Not thread safe (ToolTracker guards it with its lock).
+    """
+
+    def __init__(self, order=2, pos_std=(0.0005, 0.0005, 0.002), rot_std=0.02,
+                 pos_process=0.5, rot_process=20.0, gate=100.0, capacity=64):
+        if order not in (2, 3):
+            raise ValueError("order has to be 2 (constant velocity) or 3 (constant acceleration)")
+        self.order = order
+        self.pos_var = np.broadcast_to(np.square(np.asarray(pos_std, dtype=np.float64)), (3,)).copy()
+        self.rot_var = np.broadcast_to(np.square(np.asarray(rot_std, dtype=np.float64)), (3,)).copy()
+        self.pos_process = np.broadcast_to(np.asarray(pos_process, dtype=np.float64), (3,)).copy()
+        self.rot_process = np.broadcast_to(np.asarray(rot_process, dtype=np.float64), (3,)).copy()
+        self.gate = gate
+        # how unsure a brand new track is about its rate / acceleration
+        self.init_rate_var = (1.0, 100.0)[: order - 1]
+        self.init_rot_rate_var = (10.0, 1000.0)[: order - 1]
+
+        d = order
+        self.t = np.zeros(capacity)
+        self.live = np.zeros(capacity, dtype=bool)
+        self.px = np.zeros((capacity, 3, d))      # per axis [p, v(, a)]
+        self.pP = np.zeros((capacity, 3, d, d))
+        self.q = np.tile([1.0, 0.0, 0.0, 0.0], (capacity, 1))
+        self.rx = np.zeros((capacity, 3, d))      # per axis [error angle (0 between updates), w(, alpha)]
+        self.rP = np.zeros((capacity, 3, d, d))
+
+        # Q_ij = q * dt^(2n+1-i-j) / ((n-i)! (n-j)! (2n+1-i-j)), n = highest derivative
+        n = d - 1
+        i, j = np.meshgrid(np.arange(d), np.arange(d), indexing="ij")
+        fact = np.array([1, 1, 2, 6])
+        self._q_exp = 2 * n + 1 - i - j
+        self._q_coef = 1.0 / (fact[n - i] * fact[n - j] * self._q_exp)
+
+    @property
+    def capacity(self):
+        return len(self.t)
+
+    def update(self, slots, t, positions, quats):
+        """
+        One measurement per slot (distinct slots): t scalar or (K,), positions (K, 3),
+        quats (K, 4). Returns the filtered FilteredPose of those slots at their t.
+        """
+        slots = np.asarray(slots, dtype=np.int64)
+        if not slots.size:
+            return self.predict(slots, 0.0)
+        self._reserve(int(slots.max()) + 1)
+        t = np.broadcast_to(np.asarray(t, dtype=np.float64), slots.shape)
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        quats = np.asarray(quats, dtype=np.float64).reshape(-1, 4)
+
+        restart = ~self.live[slots]
+        old = np.flatnonzero(~restart)
+        if old.size:
+            s = slots[old]
+            px, pP, q, rx, rP = self._propagate(s, t[old])
+            px, pP, nis_p = _correct(px, pP, positions[old] - px[..., 0], self.pos_var)
+            rx, rP, nis_r = _correct(rx, rP, quat_log(quat_mul(quats[old], quat_conj(q))), self.rot_var)
+            q = quat_mul(quat_exp(rx[..., 0]), q)
+            rx[..., 0] = 0.0
+            keep = nis_p + nis_r <= self.gate
+            s = s[keep]
+            self.px[s], self.pP[s], self.q[s], self.rx[s], self.rP[s] = px[keep], pP[keep], q[keep], rx[keep], rP[keep]
+            restart[old[~keep]] = True
+
+        fresh = np.flatnonzero(restart)
+        if fresh.size:
+            self._start(slots[fresh], positions[fresh], quats[fresh])
+        self.t[slots] = t
+        self.live[slots] = True
+        return self.predict(slots, t)
+
+    def predict(self, slots, t):
+        # State of `slots` extrapolated to t (scalar or (K,)); slots that were never updated come back as NaN
+        slots = np.asarray(slots, dtype=np.int64)
+        t = np.broadcast_to(np.asarray(t, dtype=np.float64), slots.shape)
+        px, pP, q, rx, rP = self._propagate(slots, t)
+        dead = ~self.live[slots]
+        pos_std = np.sqrt(pP[..., 0, 0].max(axis=-1))
+        rot_std = np.sqrt(rP[..., 0, 0].max(axis=-1))
+        for arr in (px, q, rx, pos_std, rot_std):
+            arr[dead] = np.nan
+        return FilteredPose(t, px[..., 0], q, quat_log(q), px[..., 1], rx[..., 1], pP, rP, pos_std, rot_std)
+
+    def forget(self, slots):
+        self.live[np.asarray(slots, dtype=np.int64)] = False
+
+    def clear(self):
+        self.live[:] = False
+
+    # --- internals ---
+
+    def _propagate(self, slots, t):
+        # constant-velocity/-acceleration prediction of slots to t (copies, state untouched)
+        dt = np.maximum(t - self.t[slots], 0.0)  # out-of-order frames: don't predict backwards
+        F = self._transition(dt)
+        px = np.einsum("kij,kaj->kai", F, self.px[slots])
+        pP = np.einsum("kij,kajl,kml->kaim", F, self.pP[slots], F) + self._noise(dt, self.pos_process)
+        rx = np.einsum("kij,kaj->kai", F, self.rx[slots])
+        rP = np.einsum("kij,kajl,kml->kaim", F, self.rP[slots], F) + self._noise(dt, self.rot_process)
+        # the predicted rotation error is the rotation since the last update: fold it in
+        q = quat_mul(quat_exp(rx[..., 0]), self.q[slots])
+        rx[..., 0] = 0.0
+        return px, pP, q, rx, rP
+
+    def _transition(self, dt):
+        F = np.zeros(dt.shape + (self.order, self.order))
+        F[..., range(self.order), range(self.order)] = 1.0
+        F[..., 0, 1] = dt
+        if self.order == 3:
+            F[..., 1, 2] = dt
+            F[..., 0, 2] = 0.5 * dt * dt
+        return F
+
+    def _noise(self, dt, density):
+        # (K, 3, d, d): continuous white noise on the highest derivative, per axis
+        return density[None, :, None, None] * (self._q_coef * dt[:, None, None] ** self._q_exp)[:, None]
+
+    def _start(self, slots, positions, quats):
+        d = self.order
+        self.px[slots] = 0.0
+        self.px[slots, :, 0] = positions
+        self.rx[slots] = 0.0
+        self.q[slots] = quats / np.linalg.norm(quats, axis=1, keepdims=True)
+        pP = np.zeros((len(slots), 3, d, d))
+        rP = np.zeros((len(slots), 3, d, d))
+        pP[..., 0, 0] = self.pos_var
+        rP[..., 0, 0] = self.rot_var
+        for k in range(1, d):
+            pP[..., k, k] = self.init_rate_var[k - 1]
+            rP[..., k, k] = self.init_rot_rate_var[k - 1]
+        self.pP[slots] = pP
+        self.rP[slots] = rP
+
+    def _reserve(self, n):
+        if n <= self.capacity:
+            return
+        extra = max(n, 2 * self.capacity) - self.capacity
+        ident = np.tile([1.0, 0.0, 0.0, 0.0], (extra, 1))
+        for name in ("t", "live", "px", "pP", "q", "rx", "rP"):
+            arr = getattr(self, name)
+            pad = ident if name == "q" else np.zeros((extra,) + arr.shape[1:], dtype=arr.dtype)
+            setattr(self, name, np.concatenate([arr, pad]))
+
+
+def _correct(x, P, y, var):
+    # Scalar measurement of the value (H = [1, 0, ...]) on every axis at once.
+    # x (K, 3, d), P (K, 3, d, d), innovation y (K, 3), measurement variance var (3,)
+    S = P[..., 0, 0] + var
+    K = P[..., :, 0] / S[..., None]
+    x = x + K * y[..., None]
+    P = P - K[..., :, None] * P[..., 0, None, :]
+    P = 0.5 * (P + np.swapaxes(P, -1, -2))
+    return x, P, (y * y / S).sum(axis=-1)
+
@@ -0,0 +1,136 @@
+import numpy as np
+
+
+class KinematicsStore:
+    """
+    Pose history of every tag as struct-of-arrays ring buffers, instead of a deque of
+    (t, tvec, R) tuples per tag. Each tag gets a dense slot the first time it's seen
+    (slot_of[tag_id]); all of its samples live in row `slot` of:
+        t       (S, H)      capture time (time.monotonic() clock)
+        p       (S, H, 3)   position (tvec, meters)
+        q       (S, H, 4)   orientation, unit quaternion (w, x, y, z). Kept on one hemisphere
+                            along each tag's history, so neighbouring samples can be differenced
+        head    (S,)        column of the newest sample, count (S,) how many are valid (<= H)
+    plus the latest estimate per tag: v (S, 3) m/s, w (S, 3) rad/s, updated_at (S,).
+    S grows by doubling as new tags show up; H = history is fixed.
+
+    append() takes a whole frame's worth of tags and window() reads the last n samples of
+    any set of tags, both as single fancy-indexing operations, so cost doesn't go up with
+    per-sample Python objects. Not thread safe (ToolTracker guards it with its lock).
+    """
+
+    def __init__(self, history=10, capacity=64):
+        self.history = history
+        self.slot_of = {}  # tag_id -> slot
+        self.ids = np.full(capacity, -1, dtype=np.int64)  # slot -> tag_id
+        self.t = np.zeros((capacity, history))
+        self.p = np.zeros((capacity, history, 3))
+        self.q = np.zeros((capacity, history, 4))
+        self.head = np.zeros(capacity, dtype=np.int64)
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.v = np.zeros((capacity, 3))
+        self.w = np.zeros((capacity, 3))
+        self.updated_at = np.full(capacity, np.nan)
+
+    def __len__(self):
+        return len(self.slot_of)
+
+    def __contains__(self, tag_id):
+        return tag_id in self.slot_of
+
+    @property
+    def capacity(self):
+        return len(self.ids)
+
+    def slots(self, tag_ids, create=False):
+        # tag ids -> (N,) slots; unknown ids get a new slot (create) or -1
+        out = np.empty(len(tag_ids), dtype=np.int64)
+        for i, tag_id in enumerate(tag_ids):
+            slot = self.slot_of.get(tag_id)
+            if slot is None:
+                slot = self._new_slot(tag_id) if create else -1
+            out[i] = slot
+        return out
+
+    def append(self, tag_ids, times, positions, quats):
+        """
+        One sample for each of N distinct tags (one frame's worth):
+        times scalar or (N,), positions (N, 3), quats (N, 4). Returns their slots.
+        """
+        slots = self.slots(tag_ids, create=True)
+        quats = np.array(quats, dtype=np.float64).reshape(-1, 4)
+        had = self.count[slots] > 0
+        prev = self.q[slots, self.head[slots]]
+        # q and -q are the same rotation: stay on the previous sample's side
+        quats[had & (np.einsum("ij,ij->i", prev, quats) < 0)] *= -1
+
+        head = np.where(had, (self.head[slots] + 1) % self.history, 0)
+        self.head[slots] = head
+        self.t[slots, head] = times
+        self.p[slots, head] = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        self.q[slots, head] = quats
+        self.count[slots] = np.minimum(self.count[slots] + 1, self.history)
+        return slots
+
+    def window(self, slots=None, n=None):
+        """
+        The last n samples (default: all H) of each slot, oldest -> newest:
+            t (K, n), p (K, n, 3), q (K, n, 4), valid (K, n)
+        Rows with fewer than n samples are padded at the FRONT (valid False there).
+        """
+        slots = self.active_slots() if slots is None else np.asarray(slots, dtype=np.int64)
+        n = self.history if n is None else min(n, self.history)
+        back = np.arange(n - 1, -1, -1)  # samples before the newest, oldest column first
+        cols = (self.head[slots, None] - back) % self.history
+        rows = slots[:, None]
+        valid = back < self.count[slots, None]
+        return self.t[rows, cols], self.p[rows, cols], self.q[rows, cols], valid
+
+    def set_velocity(self, slots, v, w, updated_at):
+        self.v[slots] = v
+        self.w[slots] = w
+        self.updated_at[slots] = updated_at
+
+    def velocity(self, tag_id):
+        # (v, w) copies, or None if the tag never got an estimate
+        slot = self.slot_of.get(tag_id)
+        if slot is None or np.isnan(self.updated_at[slot]):
+            return None
+        return self.v[slot].copy(), self.w[slot].copy()
+
+    def last_update(self, tag_id):
+        slot = self.slot_of.get(tag_id)
+        if slot is None or np.isnan(self.updated_at[slot]):
+            return None
+        return float(self.updated_at[slot])
+
+    def active_slots(self):
+        return np.arange(len(self.slot_of), dtype=np.int64)
+
+    def clear(self):
+        self.slot_of.clear()
+        self.ids[:] = -1
+        self.head[:] = 0
+        self.count[:] = 0
+        self.updated_at[:] = np.nan
+
+    # --- internals ---
+
+    def _new_slot(self, tag_id):
+        slot = len(self.slot_of)
+        if slot == self.capacity:
+            self._grow(2 * self.capacity)
+        self.slot_of[tag_id] = slot
+        self.ids[slot] = tag_id
+        self.head[slot] = 0
+        self.count[slot] = 0
+        self.updated_at[slot] = np.nan
+        return slot
+
+    def _grow(self, capacity):
+        extra = capacity - self.capacity
+        for name, fill in (("ids", -1), ("t", 0.0), ("p", 0.0), ("q", 0.0), ("head", 0), ("count", 0),
+                           ("v", 0.0), ("w", 0.0), ("updated_at", np.nan)):
+            arr = getattr(self, name)
+            pad = np.full((extra,) + arr.shape[1:], fill, dtype=arr.dtype)
+            setattr(self, name, np.concatenate([arr, pad]))
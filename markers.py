@@ -0,0 +1,119 @@
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2.aruco as aruco
+import numpy as np
+
+from detector_tuning import get_detector
+
+# One marker from any family. qualified_id is "family:id" (e.g. "tag25h9:3", "DICT_4X4_50:3")
+# so the same number from two families never collides. corners are (4, 2) float32 pixels
+# in whatever order that family's detector reports them.
+Marker = namedtuple("Marker", ["family", "id", "qualified_id", "corners", "center"])
+
+APRILTAG_FAMILIES = ("tag16h5", "tag25h9", "tag36h11", "tagCircle21h7", "tagCircle49h12",
+                     "tagCustom48h12", "tagStandard41h12", "tagStandard52h13")
+
+
+class MarkerEngine:
+    """
+    Runs every configured marker family over ONE grayscale frame exactly once and returns a
+    single merged, de-duplicated list of Markers.
+
+    families: names in priority order, AprilTag families ("tag25h9") and/or ArUco dictionary
+    names ("DICT_4X4_50"). Detector and dictionary objects are built once here and reused.
+    Families run in parallel on a thread pool; pupil_apriltags (ctypes) and cv2 both release
+    the GIL while they work, so this actually uses several cores.
+    """
+
+    def __init__(self, families, apriltag_params=None, max_workers=None, dedup_px=4.0):
+        self.families = list(families)
+        self.dedup_px = dedup_px
+        apriltag_params = dict(apriltag_params or {})
+
+        self._jobs = []
+        for name in self.families:
+            if name in APRILTAG_FAMILIES:
+                detector = get_detector(families=name, **apriltag_params)
+                self._jobs.append((name, self._apriltag_job(name, detector)))
+            elif hasattr(aruco, name):
+                self._jobs.append((name, self._aruco_job(name)))
+            else:
+                raise ValueError(f"Unknown marker family: {name}")
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or len(self._jobs),
+                                        thread_name_prefix="markers")
+        # each detector object may only be used by one thread at a time
+        self._lock = threading.Lock()
+
+    def detect(self, gray):
+        with self._lock:
+            futures = [self._pool.submit(job, gray) for _, job in self._jobs]
+            found = []
+            for (name, _), future in zip(self._jobs, futures):
+                try:
+                    found.extend(future.result())
+                except Exception as e:
+                    print(f"Detection error ({name}):", e)
+        return self._dedupe(found)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    # --- per-family jobs ---
+
+    @staticmethod
+    def _apriltag_job(name, detector):
+        def run(gray):
+            return [
+                Marker(name, int(r.tag_id), f"{name}:{int(r.tag_id)}",
+                       r.corners.astype(np.float32), r.center.astype(np.float32))
+                for r in detector.detect(gray)
+            ]
+        return run
+
+    @staticmethod
+    def _aruco_job(name):
+        dictionary_id = getattr(aruco, name)
+        if hasattr(aruco, "ArucoDetector"):
+            # OpenCV >= 4.7
+            detector = aruco.ArucoDetector(aruco.getPredefinedDictionary(dictionary_id),
+                                           aruco.DetectorParameters())
+            detect_markers = detector.detectMarkers
+        else:
+            # Fix for older versions
+            dictionary = aruco.Dictionary_get(dictionary_id)
+            parameters = aruco.DetectorParameters_create()
+
+            def detect_markers(gray):
+                return aruco.detectMarkers(gray, dictionary, parameters=parameters)
+
+        def run(gray):
+            corners, ids, _rejected = detect_markers(gray)
+            if ids is None:
+                return []
+            out = []
+            for c, marker_id in zip(corners, ids.ravel()):
+                c = c.reshape(4, 2).astype(np.float32)
+                out.append(Marker(name, int(marker_id), f"{name}:{int(marker_id)}", c, c.mean(axis=0)))
+            return out
+        return run
+
+    # --- merging ---
+
+    def _dedupe(self, markers):
+        # Same qualified id twice, or two families claiming the same spot in the image:
+        # keep whichever family comes first in self.families
+        rank = {name: i for i, name in enumerate(self.families)}
+        markers.sort(key=lambda m: rank[m.family])
+        kept = []
+        seen_ids = set()
+        for m in markers:
+            if m.qualified_id in seen_ids:
+                continue
+            if any(np.linalg.norm(m.center - k.center) < self.dedup_px for k in kept):
+                continue
+            seen_ids.add(m.qualified_id)
+            kept.append(m)
+        return kept
@@ -0,0 +1,137 @@
+import time
+from collections import OrderedDict, namedtuple
+
+import cv2
+import numpy as np
+
+# What gets drawn for one tag:
+#   anchor = (x, y) baseline-left of the label, text = static part ("Scalpel (April_ID: 3) "),
+#   numbers = (x, y, z) shown as "pos: x=..., y=..., z=...", axes = (4, 2) pixels
+#   (origin, x tip, y tip, z tip) or None
+OverlayItem = namedtuple("OverlayItem", ["tag_id", "anchor", "text", "numbers", "axes"])
+
+AXIS_COLORS = ((0, 0, 255), (0, 255, 0), (255, 0, 0))  # x, y, z like cv2.drawFrameAxes (BGR)
+
+
+class _SpriteCache:
+    # LRU of rendered text sprites: text -> (alpha mask, rows above the baseline, advance width)
+    def __init__(self, font, scale, thickness, size=512):
+        self.font, self.scale, self.thickness = font, scale, thickness
+        self.size = size
+        self.sprites = OrderedDict()
+        self.rendered = 0  # how many putText calls we actually paid for
+
+    def get(self, text):
+        sprite = self.sprites.get(text)
+        if sprite is not None:
+            self.sprites.move_to_end(text)
+            return sprite
+        (w, h), baseline = cv2.getTextSize(text, self.font, self.scale, self.thickness)
+        pad = self.thickness
+        mask = np.zeros((h + baseline + 2 * pad, w + 2 * pad), dtype=np.uint8)
+        cv2.putText(mask, text, (pad, h + pad), self.font, self.scale, 255, self.thickness)
+        sprite = (mask, h + pad, w)  # mask, rows above the baseline, advance width
+        self.sprites[text] = sprite
+        self.rendered += 1
+        if len(self.sprites) > self.size:
+            self.sprites.popitem(last=False)
+        return sprite
+
+
+class OverlayCompositor:
+    """
+    Draws tag labels on their own layer and composites that onto the video once.
+      - label text is rendered to sprites once and re-used (tool names / ids barely change)
+      - the numeric "pos: ..." field is only re-formatted every 1/numeric_hz seconds per tag,
+        so it also comes out of the sprite cache between refreshes
+      - labels are all one color, so the layer is just a mask: a blit is one small max() into
+        it, and the composite is a single masked copy from a pre-filled color plane
+      - axes move every frame (nothing to cache), they're drawn straight onto the video
+        underneath the labels, all tags in one batch (draw_axes)
+    enabled=False turns the whole thing off (headless: render() hands the frame back untouched).
+    One thread only (the annotate stage).
+    """
+
+    def __init__(self, color=(255, 100, 0), font=cv2.FONT_HERSHEY_SIMPLEX, scale=0.5, thickness=2,
+                 numeric_hz=5.0, axis_thickness=3, min_batch=8, enabled=True):
+        self.color = np.array(color, dtype=np.uint8)
+        self.numeric_hz = numeric_hz
+        self.axis_thickness = axis_thickness
+        self.min_batch = min_batch  # below this many tags callers just use cv2.drawFrameAxes per tag
+        self.enabled = enabled
+        self.sprites = _SpriteCache(font, scale, thickness)
+
+        self._numbers = {}      # tag_id -> (formatted text, when it was formatted)
+        self._color = None      # (h, w, 3) plane of the label color, built once per frame size
+        self._mask = None       # (h, w) the label layer: 255 where text covers the video
+
+    def render(self, frame, items, now=None):
+        # Composites the overlay for `items` onto `frame` (in place) and returns it
+        if not self.enabled or not items:
+            return frame
+        now = time.monotonic() if now is None else now
+        h, w = frame.shape[:2]
+        if self._mask is None or self._mask.shape != (h, w):
+            self._color = np.empty((h, w, 3), dtype=np.uint8)
+            self._color[:] = self.color
+            self._mask = np.zeros((h, w), dtype=np.uint8)
+        else:
+            self._mask[:] = 0
+
+        axes = [item.axes for item in items if item.axes is not None]
+        if axes:
+            self.draw_axes(frame, axes)
+        for item in items:
+            x, y = int(item.anchor[0]), int(item.anchor[1])
+            advance = self._blit(item.text, x, y)
+            if item.numbers is not None:
+                self._blit(self._numeric(item.tag_id, item.numbers, now), x + advance, y)
+
+        cv2.copyTo(self._color, self._mask, frame)
+        return frame
+
+    def forget(self, seen_ids):
+        # drop numeric state for tags that left the view
+        for tag_id in list(self._numbers):
+            if tag_id not in seen_ids:
+                del self._numbers[tag_id]
+
+    # --- pieces ---
+
+    def _numeric(self, tag_id, numbers, now):
+        cached = self._numbers.get(tag_id)
+        if cached is None or now - cached[1] >= 1.0 / self.numeric_hz:
+            x, y, z = numbers
+            cached = (f"pos: x={x:.3f}, y={y:.3f}, z={z:.3f}", now)
+            self._numbers[tag_id] = cached
+        return cached[0]
+
+    def _blit(self, text, x, y):
+        # puts the sprite for `text` with its baseline-left at (x, y); returns its advance
+        sprite, above, advance = self.sprites.get(text)
+        top, left = y - above, x
+        sh, sw = sprite.shape
+        h, w = self._mask.shape
+        y0, x0 = max(top, 0), max(left, 0)
+        y1, x1 = min(top + sh, h), min(left + sw, w)
+        if y1 <= y0 or x1 <= x0:
+            return advance
+        region = self._mask[y0:y1, x0:x1]
+        np.maximum(region, sprite[y0 - top:y1 - top, x0 - left:x1 - left], out=region)
+        return advance
+
+    def draw_axes(self, frame, axes):
+        """
+        axes: (N, 4, 2) pixels (origin, x tip, y tip, z tip) for every tag at once.
+        Straight onto the video, one cv2.polylines call per axis color for ALL tags.
+        """
+        if not self.enabled or len(axes) == 0:
+            return frame
+        axes = np.asarray(axes, dtype=np.float64)
+        # tips behind the camera project to nonsense (and overflow cv2's int coords)
+        good = np.isfinite(axes).all(axis=(1, 2)) & (np.abs(axes).max(axis=(1, 2), initial=0) < 1e5)
+        pts = np.rint(axes[good]).astype(np.int32)
+        for k, color in enumerate(AXIS_COLORS, start=1):
+            segments = np.ascontiguousarray(pts[:, [0, k]])  # (N, 2, 2): origin -> tip
+            cv2.polylines(frame, list(segments), False, color, self.axis_thickness)
+        return frame
@@ -0,0 +1,260 @@
+import threading
+import time
+from collections import deque
+
+from camera import Frame
+from stages import StageChain
+
+
+class LatestQueue:
+    # Bounded queue that drops the OLDEST item when full, so consumers always see fresh data
+    # on_drop(item) runs for everything dropped or cleared (packets give their buffers back)
+    def __init__(self, maxsize=1, on_drop=None):
+        self.items = deque()
+        self.maxsize = maxsize
+        self.on_drop = on_drop
+        self.dropped = 0
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            old = None
+            if len(self.items) >= self.maxsize:
+                old = self.items.popleft()
+                self.dropped += 1
+            self.items.append(item)
+            self._cond.notify()
+        if old is not None and self.on_drop is not None:
+            self.on_drop(old)
+
+    def get(self, timeout=None):
+        # Blocks up to `timeout` seconds; returns None if nothing arrived (or the queue closed)
+        with self._cond:
+            self._cond.wait_for(lambda: self.items or self.closed, timeout)
+            return self.items.popleft() if self.items else None
+
+    def get_nowait(self):
+        with self._cond:
+            return self.items.popleft() if self.items else None
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def reopen(self):
+        self.clear()
+        with self._cond:
+            self.closed = False
+
+    def clear(self):
+        with self._cond:
+            old = list(self.items)
+            self.items.clear()
+        if self.on_drop is not None:
+            for item in old:
+                self.on_drop(item)
+
+
+class FramePacket:
+    # Everything one frame picks up on its way through the pipeline
+    # The packet owns one reference to each pooled buffer it carries (the frame, the gray
+    # image, the annotated copy); release() gives them all back, exactly once. Whoever drops
+    # or finishes with a packet releases it: the pipeline for dropped/failed packets, the last
+    # consumer (tracker output queue / frame bus backlog) for finished ones.
+    def __init__(self, frame):
+        self.frame = frame        # camera.Frame (raw image, seq, timestamp)
+        self.timestamp = frame.timestamp  # capture time (time.monotonic() clock)
+        # per-stage completion times; our own copy, the Frame can be shared between pipelines
+        self.stamps = dict(frame.stamps)
+        self.gray = None
+        self.tags = []            # raw detector output
+        self.poses = []           # list of stages.TagPose
+        self.pose_fresh = True    # False = poses held over from an earlier frame (pose rate < detect rate)
+        self.pose_batch = None    # pose_solver.PoseBatch for all of self.tags
+        self.seen_ids = set()
+        self.image = None         # annotated BGR copy
+        self.display = None       # PIL image ready for the label
+        self.buffers = []         # pooled buffers.Buffer this packet holds a reference to
+        self._released = False
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self.frame.release()
+        for buf in self.buffers:
+            buf.release()
+        self.buffers = []
+
+    @classmethod
+    def wrap(cls, image, seq=0, timestamp=None):
+        # a packet for a bare image (scripts reading cv2.VideoCapture themselves)
+        return cls(Frame(image, seq, time.monotonic() if timestamp is None else timestamp))
+
+    def stamp(self, stage):
+        self.stamps[stage] = time.monotonic()
+
+    def latency(self):
+        # ms from capture to the end of every stage reached so far
+        return {stage: (t - self.timestamp) * 1000.0 for stage, t in self.stamps.items()}
+
+
+class TagPipeline:
+    """
+    Runs a list of stages (stages.py) with each stage on its own worker thread and
+    drop-oldest queues in between; the camera's newest frame is picked up at the front.
+    The Tk thread only calls poll() to pick up finished packets, it never touches the
+    camera or the detector.
+
+    What runs is up to the caller, e.g. the tracker's
+        [GrayStage(), detect_stage(detector), PoseStage(solver), VelocityStage(...), OverlayStage(...)]
+    configure(pose=False, ...) switches stages on/off by name while running, and every stage
+    is timed (stage.rate: cost per frame, achieved fps; timing_summary()).
+    If there's a "detect" stage its rate (hz) decides when a frame is admitted at all.
+    Stages with a collect() method (stages.PooledDetectStage) hand packets back from a
+    collector thread of their own.
+    result_backlog = how many finished packets poll() can have waiting before the oldest
+    gets dropped.
+    """
+
+    def __init__(self, camera, stages, queue_size=1, result_backlog=1):
+        self.camera = camera
+        self.chain = stages if isinstance(stages, StageChain) else StageChain(stages)
+        # queues[i] feeds stage i; the last one holds finished results for the UI
+        self.queues = [LatestQueue(queue_size, on_drop=FramePacket.release) for _ in range(len(self.chain) + 1)]
+        self.results = self.queues[-1]
+        self.results.maxsize = result_backlog
+
+        self._threads = []
+        self._running = False
+        self.dropped_frames = 0  # camera frames that arrived while we were busy
+        self.latency_ms = {}     # stage -> EMA of ms since capture, updated as the UI polls
+
+    # --- stages ---
+
+    def stage(self, name):
+        return self.chain.get(name)
+
+    @property
+    def detector(self):
+        detect = self.chain.get("detect")
+        return detect.detector if detect is not None else None
+
+    @property
+    def rates(self):
+        # stage name -> scheduler.Rate (target / achieved / cost), for format_rates
+        return {stage.name: stage.rate for stage in self.chain}
+
+    def configure(self, **enabled):
+        # configure(pose=False, overlay=True): safe while running, stages pick it up from the next packet
+        for name, on in enabled.items():
+            stage = self.chain.get(name)
+            if stage is not None:
+                stage.enabled = on
+
+    def timing_summary(self):
+        return self.chain.timing_summary()
+
+    # --- lifecycle ---
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        if self._running:
+            return
+        for q in self.queues:
+            q.reopen()
+        self.chain.start()
+        self._running = True
+        self._threads = [threading.Thread(target=self._capture_loop, name="pipeline-capture", daemon=True)]
+        for i, stage in enumerate(self.chain):
+            self._threads.append(threading.Thread(
+                target=self._stage_loop, args=(stage, self.queues[i], self.queues[i + 1]),
+                name=f"pipeline-{stage.name}", daemon=True
+            ))
+            if hasattr(stage, "collect"):
+                self._threads.append(threading.Thread(
+                    target=self._collect_loop, args=(stage, self.queues[i + 1]),
+                    name=f"pipeline-{stage.name}-collect", daemon=True
+                ))
+        for t in self._threads:
+            t.start()
+
+    def stop(self):
+        # Joins the workers so nobody is still inside the (shared) detector afterwards
+        self._running = False
+        for q in self.queues:
+            q.close()
+        for t in self._threads:
+            t.join(timeout=1.0)
+        self._threads = []
+        self.chain.stop()
+        for q in self.queues[:-1]:
+            q.clear()  # half-processed packets give their buffers back; results stay for poll()
+
+    def poll(self, timeout=None):
+        # Oldest finished packet, or None; timeout=None doesn't wait at all
+        packet = self.results.get_nowait() if timeout is None else self.results.get(timeout)
+        if packet is not None:
+            packet.stamp("poll")
+            for stage, ms in packet.latency().items():
+                old = self.latency_ms.get(stage)
+                self.latency_ms[stage] = ms if old is None else old + 0.1 * (ms - old)
+        return packet
+
+    def latency_summary(self):
+        # "capture->detect 18 | pose 19 | ui 31 ms" style one-liner for the dashboard
+        stages = [s for s in ("detect", "pose", "poll") if s in self.latency_ms]
+        if not stages:
+            return ""
+        parts = [f"{'ui' if s == 'poll' else s} {self.latency_ms[s]:.0f}" for s in stages]
+        return "Latency from capture: " + " | ".join(parts) + " ms"
+
+    # --- workers ---
+
+    def _capture_loop(self):
+        last_seq = 0
+        detect = self.chain.get("detect")
+        admit = detect.rate if detect is not None else None
+        while self._running:
+            # hold off until a detection is due, then take the newest frame there is
+            if admit is not None and not admit.wait(0.1):
+                continue
+            frame, dropped = self.camera.wait_latest(last_seq, timeout=0.1)  # our reference, the packet owns it
+            if frame is None:
+                continue
+            if admit is not None:
+                admit.advance()
+            last_seq = frame.seq
+            self.dropped_frames += dropped
+            packet = FramePacket(frame)
+            packet.stamp("pickup")
+            self.queues[0].put(packet)
+
+    def _collect_loop(self, stage, q_out):
+        while self._running:
+            packet = stage.collect(timeout=0.1)
+            if packet is None:
+                continue
+            packet.stamp(stage.name)
+            q_out.put(packet)
+
+    def _stage_loop(self, stage, q_in, q_out):
+        while self._running:
+            packet = q_in.get(timeout=0.1)
+            if packet is None:
+                continue
+            try:
+                out = stage(packet)
+            except Exception as e:
+                print(f"Pipeline error ({stage.name}): {e}")
+                packet.release()
+                continue
+            packet = out
+            if packet is not None:
+                packet.stamp(stage.name)
+                q_out.put(packet)
@@ -1,6 +1,11 @@
 import cv2
 import numpy as np
 from pupil_apriltags import Detector
+
+from overlay import OverlayCompositor
+from pipeline import FramePacket
+from pose_solver import PoseSolver
+from stages import CallbackSink, DetectStage, GrayStage, ImshowSink, OverlayStage, PoseStage, StageChain
 # Load calibration
 data = np.load("camera_calibration.npz")
 camera_matrix = data['camera_matrix']
@@ -26,54 +31,44 @@ tool_map = {
 
 # Initialize AprilTag detector
 at_detector = Detector(families='tag25h9')
-    
-cap = cv2.VideoCapture(0)
 
 # Dictionary saving tags with their actual respective positions
 # This is useful to temporariy store the tag's positions until they are handed off to their calss attributes and whathot
 true_positions = {}
 
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    tags = at_detector.detect(gray)
+def describe(tag_id):
+    return tool_map.get(tag_id, f"Unknown Tool {tag_id}"), "ID", tag_id
 
-    for tag in tags:
-        corners = tag.corners.astype(np.float32)
+def save_positions(packet):
+    for pose in packet.poses:
+        true_positions[pose.tag_id] = np.round(pose.tvec.ravel(), 2)
 
-        # Pose estimation
-        success, rvec, tvec = cv2.solvePnP(
-            obj_points, corners, camera_matrix, dist_coeffs
-        )
+solver = PoseSolver(camera_matrix, dist_coeffs, obj_points)
 
-        rounded_pos = np.round(tvec.ravel(), 2)
-        true_positions[tag.tag_id] = rounded_pos
+# gray -> detect -> solvePnP (all tags at once) -> axes + labels -> window
+chain = StageChain([
+    GrayStage(),
+    DetectStage(at_detector),
+    PoseStage(solver),
+    CallbackSink(save_positions, name="positions"),
+    OverlayStage(solver.geometry, describe, OverlayCompositor()),
+    ImshowSink("AprilTag Pose"),
+]).start()
 
-        if success:
-            cv2.drawFrameAxes(frame, 
-                              camera_matrix, 
-                              dist_coeffs, 
-                              rvec, 
-                              tvec, 
-                              0.02)
+cap = cv2.VideoCapture(0)
+seq = 0
 
-            # Display tag info
-            tool_name = tool_map.get(tag.tag_id, f"Unknown Tool {tag.tag_id}")
-            cv2.putText(frame, 
-                        f"{tool_name} (ID: {tag.tag_id}) pos: x={tvec[0][0]:.3f}, y={tvec[1][0]:.3f}, z={tvec[2][0]:.3f}",
-                        (int(tag.corners[0][0]), int(tag.corners[0][1]) - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 
-                        0.5, 
-                        (255, 100, 0), 
-                        2)
+while True:
+    ret, frame = cap.read()
+    if not ret:
+        break
 
-    cv2.imshow("AprilTag Pose", frame)
+    seq += 1
+    chain.run(FramePacket.wrap(frame, seq))
 
     if cv2.waitKey(1) & 0xFF == ord('q'):
         break
 
+chain.stop()
 cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+cv2.destroyAllWindows()
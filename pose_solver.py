@@ -0,0 +1,225 @@
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from geometry import CameraGeometry
+from rotations import matrix_to_rotvec
+
+# Result of solving a whole frame's worth of tags at once
+# rvecs/tvecs are (N, 3), rotations (N, 3, 3), ok (N,) bool, errors (N,) RMS reprojection error in px
+PoseBatch = namedtuple("PoseBatch", ["rvecs", "tvecs", "rotations", "ok", "errors"])
+
+_IDENTITY = np.eye(3)
+
+
+class PoseSolver:
+    """
+    Solves every tag in a frame in one NumPy pass instead of one cv2.solvePnP per tag.
+    All tags share the same planar square model (obj_points, z = 0), so per tag we:
+      1. undistort the corners (one vectorized lookup for the whole frame, see geometry.py),
+         everything after this works in normalized coordinates with no distortion model
+      2. fit the model -> normalized image homography (batched 8x8 DLT solve)
+      3. pull R, t out of the homography (batched SVD to get a proper rotation)
+      4. run a few batched Gauss-Newton/LM steps on the reprojection error
+    """
+
+    def __init__(self, camera_matrix, dist_coeffs, obj_points, refine_iters=10, tol=1e-9, min_batch=8,
+                 calibrated_size=None):
+        self.geometry = CameraGeometry(camera_matrix, dist_coeffs, calibrated_size)
+        self.camera_matrix = self.geometry.camera_matrix
+        self.dist_coeffs = np.asarray(dist_coeffs, dtype=np.float64)
+        self.obj_points = np.asarray(obj_points, dtype=np.float64).reshape(4, 3)
+        self.refine_iters = refine_iters  # max LM steps, 0 = homography pose only
+        self.tol = tol                    # stop early once every tag's step is this small
+        # below this many tags the fixed NumPy overhead loses to plain per-tag solvePnP
+        self.min_batch = min_batch
+
+        # Conditioning: scale the model to about unit size before the DLT
+        self._scale = np.abs(self.obj_points[:, :2]).max()
+        self._model = self.obj_points[:, :2] / self._scale       # (4, 2)
+        self._focal = 0.5 * (self.camera_matrix[0, 0] + self.camera_matrix[1, 1])
+
+    def solve(self, corners, image_size=None):
+        # image_size=(w, h) of the frame the corners came from picks the cached undistortion table
+        corners = np.asarray(corners, dtype=np.float64).reshape(-1, 4, 2)
+        n = corners.shape[0]
+        if n == 0:
+            return PoseBatch(np.zeros((0, 3)), np.zeros((0, 3)), np.zeros((0, 3, 3)),
+                             np.zeros(0, bool), np.zeros(0))
+
+        # 1. pixels -> normalized camera coordinates, all corners in one go
+        uv = self.geometry.normalize(corners, image_size)
+        if n < self.min_batch:
+            return self._solve_each(uv)
+
+        # 2. + 3. homography -> initial pose
+        R, t, ok = self._pose_from_homography(self._homographies(uv), uv)
+
+        # 4. refinement (small tags sit in a flat valley, so allow a few extra steps)
+        for _ in range(self.refine_iters):
+            R, t, step = self._refine_step(R, t, uv)
+            if step < self.tol:
+                break
+
+        residual = self._residuals(R, t, uv)
+        errors = np.sqrt((residual ** 2).sum(axis=2).mean(axis=1)) * self._focal
+        ok &= np.isfinite(errors) & (t[:, 2] > 0)
+        return PoseBatch(matrix_to_rotvec(R), t, R, ok, errors)
+
+    def _solve_each(self, uv):
+        # already undistorted, so solvePnP gets an identity camera and no distortion model
+        n = uv.shape[0]
+        rvecs, tvecs, ok = np.zeros((n, 3)), np.zeros((n, 3)), np.zeros(n, bool)
+        tvecs[:, 2] = 1.0  # collapsed quads stay put 1 m out, like in _translation_for
+        for i in np.flatnonzero(_quad_area(uv) > 1e-12):
+            ok[i], rvec, tvec = cv2.solvePnP(self.obj_points, uv[i], _IDENTITY, None)
+            rvecs[i], tvecs[i] = rvec.ravel(), tvec.ravel()
+        R = _rvec_to_rotation(rvecs)
+        residual = self._residuals(R, tvecs, uv)
+        errors = np.sqrt((residual ** 2).sum(axis=2).mean(axis=1)) * self._focal
+        ok &= np.isfinite(errors) & (tvecs[:, 2] > 0)
+        return PoseBatch(rvecs, tvecs, R, ok, errors)
+
+    # --- homography fit ---
+
+    def _homographies(self, uv):
+        # DLT with h33 = 1: two rows per correspondence, 8 unknowns, one solve per tag
+        n = uv.shape[0]
+        X = np.broadcast_to(self._model[:, 0], (n, 4))
+        Y = np.broadcast_to(self._model[:, 1], (n, 4))
+        u, v = uv[..., 0], uv[..., 1]
+        one, zero = np.ones((n, 4)), np.zeros((n, 4))
+
+        A = np.empty((n, 8, 8))
+        A[:, 0::2] = np.stack([X, Y, one, zero, zero, zero, -u * X, -u * Y], axis=2)
+        A[:, 1::2] = np.stack([zero, zero, zero, X, Y, one, -v * X, -v * Y], axis=2)
+        b = np.empty((n, 8))
+        b[:, 0::2] = u
+        b[:, 1::2] = v
+
+        ok = np.abs(np.linalg.det(A)) > 1e-12
+        A[~ok] = np.eye(8)  # keep the batched solve from blowing up on degenerate quads
+        h = np.linalg.solve(A, b[..., None])[..., 0]
+        H = np.concatenate([h, np.ones((n, 1))], axis=1).reshape(n, 3, 3)
+        H[~ok] = np.nan
+        # undo the model scaling so H maps metric model coords
+        return H * np.array([1.0 / self._scale, 1.0 / self._scale, 1.0])
+
+    def _pose_from_homography(self, H, uv):
+        h1, h2, h3 = H[:, :, 0], H[:, :, 1], H[:, :, 2]
+        lam = 2.0 / (np.linalg.norm(h1, axis=1) + np.linalg.norm(h2, axis=1))
+        # tag has to be in front of the camera
+        lam = np.where(h3[:, 2] < 0, -lam, lam)
+
+        # closest orthonormal pair to [h1 h2], then r3 = r1 x r2
+        M = np.stack([h1, h2], axis=2) * lam[:, None, None]
+        ok = np.isfinite(M).all(axis=(1, 2)) & np.isfinite(h3).all(axis=1)
+        M[~ok] = np.eye(3, 2)
+        U, _, Vt = np.linalg.svd(M, full_matrices=False)
+        r12 = U @ Vt
+        R = np.concatenate([r12, np.cross(r12[:, :, 0], r12[:, :, 1])[:, :, None]], axis=2)
+        t, solved = self._translation_for(R, uv)
+        return R, t, ok & solved
+
+    def _translation_for(self, R, uv):
+        # With R fixed the projection equations are linear in t:
+        #   [1 0 -u; 0 1 -v] t = [u (r3.X) - r1.X; v (r3.X) - r2.X]
+        RX = np.einsum("nij,kj->nki", R, self.obj_points)
+        u, v = uv[..., 0], uv[..., 1]
+        n = uv.shape[0]
+        A = np.zeros((n, 4, 2, 3))
+        A[..., 0, 0] = 1.0
+        A[..., 1, 1] = 1.0
+        A[..., 0, 2] = -u
+        A[..., 1, 2] = -v
+        b = np.stack([u * RX[..., 2] - RX[..., 0], v * RX[..., 2] - RX[..., 1]], axis=2)
+        A = A.reshape(n, 8, 3)
+        At = A.transpose(0, 2, 1)
+        N, rhs = At @ A, At @ b.reshape(n, 8, 1)
+        # all four corners on one point (collapsed quad): no translation to find, and a
+        # singular N would take the whole batch down with it. Park those 1 m in front of the
+        # camera so the refinement stays finite; they come back not ok
+        ok = np.abs(np.linalg.det(N)) > 1e-12
+        N[~ok] = np.eye(3)
+        rhs[~ok] = [[0.0], [0.0], [1.0]]
+        return np.linalg.solve(N, rhs)[..., 0], ok
+
+    # --- refinement ---
+
+    def _residuals(self, R, t, uv):
+        P = np.einsum("nij,kj->nki", R, self.obj_points) + t[:, None, :]
+        return P[..., :2] / P[..., 2:3] - uv
+
+    def _refine_step(self, R, t, uv, damping=1e-6):
+        # LM step on all tags at once. Rotation is updated on the left: R <- exp(dw) R
+        a = np.einsum("nij,kj->nki", R, self.obj_points)        # R X, (N, 4, 3)
+        P = a + t[:, None, :]
+        iz = 1.0 / P[..., 2]
+        px, py = P[..., 0] * iz, P[..., 1] * iz
+        r = np.stack([px - uv[..., 0], py - uv[..., 1]], axis=2).reshape(-1, 8)
+
+        # d(proj)/d(dw, dt), using dP/d(dw) = -[RX]_x and dP/dt = I
+        a0, a1, a2 = a[..., 0], a[..., 1], a[..., 2]
+        J = np.empty(P.shape[:2] + (2, 6))
+        J[..., 0, 0] = -px * a1 * iz
+        J[..., 0, 1] = (a2 + px * a0) * iz
+        J[..., 0, 2] = -a1 * iz
+        J[..., 1, 0] = -(a2 + py * a1) * iz
+        J[..., 1, 1] = py * a0 * iz
+        J[..., 1, 2] = a0 * iz
+        J[..., 0, 3] = iz
+        J[..., 0, 4] = 0.0
+        J[..., 0, 5] = -px * iz
+        J[..., 1, 3] = 0.0
+        J[..., 1, 4] = iz
+        J[..., 1, 5] = -py * iz
+        J = J.reshape(-1, 8, 6)
+
+        Jt = J.transpose(0, 2, 1)
+        JtJ = Jt @ J
+        # Marquardt scaling: rotation and translation columns differ by orders of magnitude
+        idx = np.arange(6)
+        JtJ[:, idx, idx] *= 1.0 + damping
+        rhs = -(Jt @ r[..., None])
+        try:
+            delta = np.linalg.solve(JtJ, rhs)[..., 0]
+        except np.linalg.LinAlgError:
+            # degenerate tag (e.g. a collapsed quad) somewhere in the batch: leave those where
+            # they are, solve() already has them as not ok
+            bad = ~(np.linalg.cond(JtJ) < 1e12)
+            JtJ[bad] = np.eye(6)
+            rhs[bad] = 0.0
+            delta = np.linalg.solve(JtJ, rhs)[..., 0]
+
+        return _rvec_to_rotation(delta[:, :3]) @ R, t + delta[:, 3:], np.abs(delta).max()
+
+
+def _quad_area(uv):
+    # shoelace area of every (N, 4, 2) quad, ~0 when the corners collapse onto a point/line
+    x, y = uv[..., 0], uv[..., 1]
+    return 0.5 * np.abs((x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y).sum(axis=1))
+
+
+# --- batched rotation helpers ---
+
+def _skew(v):
+    out = np.zeros(v.shape + (3,))
+    out[..., 0, 1], out[..., 0, 2] = -v[..., 2], v[..., 1]
+    out[..., 1, 0], out[..., 1, 2] = v[..., 2], -v[..., 0]
+    out[..., 2, 0], out[..., 2, 1] = -v[..., 1], v[..., 0]
+    return out
+
+
+def _rvec_to_rotation(rvecs):
+    # Rodrigues formula for (N, 3) rotation vectors
+    theta = np.linalg.norm(rvecs, axis=1)
+    small = theta < 1e-8
+    safe = np.where(small, 1.0, theta)
+    K = _skew(rvecs / safe[:, None])
+    s = np.where(small, 0.0, np.sin(theta))[:, None, None]
+    c = np.where(small, 0.0, 1.0 - np.cos(theta))[:, None, None]
+    R = np.eye(3) + s * K + c * (K @ K)
+    # first order for tiny angles
+    R[small] = np.eye(3) + _skew(rvecs[small])
+    return R
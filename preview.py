@@ -0,0 +1,82 @@
+import tkinter as tk
+
+import customtkinter as ctk
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+import helpers
+
+
+def preview_label(parent, **kwargs):
+    # The label a PreviewRenderer draws into: a plain tk.Label, since a CTkLabel only takes
+    # CTkImage (it warns about a PhotoImage and drops HiDPI scaling), and a CTkImage would
+    # mean a new PhotoImage per frame. Sized in real pixels by the <Configure> handler, so
+    # HiDPI displays get a full resolution preview anyway. Background matches the CTk frame.
+    widget = parent
+    color = widget.cget("fg_color")
+    while color == "transparent" and widget.master is not None:
+        widget = widget.master
+        color = widget.cget("fg_color") if isinstance(widget, ctk.CTkBaseClass) else "transparent"
+    if color == "transparent":
+        color = ctk.ThemeManager.theme["CTk"]["fg_color"]
+    if isinstance(color, (list, tuple)):
+        color = color[1] if ctk.get_appearance_mode() == "Dark" else color[0]
+    return tk.Label(parent, bg=color, bd=0, highlightthickness=0, padx=0, pady=0, **kwargs)
+
+
+class PreviewRenderer:
+    """
+    Puts BGR frames into a label (preview_label) without allocating per frame.
+    Everything is built once per preview size (i.e. per on_resize) and reused:
+      - a resize buffer (cv2.resize writes straight into it)
+      - an RGBA buffer, which a PIL image wraps without copying (Image.frombuffer; PIL
+        keeps RGB as 4 bytes per pixel internally, so only RGBA can be shared like this)
+      - one persistent ImageTk.PhotoImage that gets its pixels replaced with paste()
+    so a frame costs one resize, one color conversion and the copy into Tk (Pillow stages
+    that through a short-lived C buffer, nothing the Python GC sees), and the label only
+    gets configure()d when the size changes.
+    Tk thread only.
+    """
+
+    def __init__(self, label, fit=helpers.fit_4_3):
+        self.label = label
+        self.fit = fit              # (max_w, max_h) -> (w, h) of the preview inside the label
+        self.target = None          # wanted (w, h); None until the label is laid out
+        self.size = None            # (w, h) the buffers are currently allocated for
+        self.photo = None
+        self._resized = None
+        self._rgba = None
+        self._pil = None
+
+    def set_target(self, max_w, max_h):
+        # call from the label's <Configure> handler (or once, for fixed-size previews)
+        w, h = self.fit(max_w, max_h)
+        self.target = (w, h) if w > 0 and h > 0 else None
+
+    def show(self, frame):
+        if self.target is None:
+            return False
+        if self.target != self.size:
+            self._allocate(self.target)
+
+        w, h = self.size
+        src = frame
+        if frame.shape[1] != w or frame.shape[0] != h:
+            shrinking = w < frame.shape[1]
+            cv2.resize(frame, (w, h), dst=self._resized,
+                       interpolation=cv2.INTER_AREA if shrinking else cv2.INTER_LINEAR)
+            src = self._resized
+        cv2.cvtColor(src, cv2.COLOR_BGR2RGBA, dst=self._rgba)
+        self.photo.paste(self._pil)
+        return True
+
+    def _allocate(self, size):
+        w, h = size
+        self._resized = np.empty((h, w, 3), dtype=np.uint8)
+        self._rgba = np.empty((h, w, 4), dtype=np.uint8)
+        # shares memory with self._rgba, so it always shows whatever cvtColor wrote last
+        self._pil = Image.frombuffer("RGBA", (w, h), self._rgba, "raw", "RGBA", 0, 1)
+        self.photo = ImageTk.PhotoImage("RGBA", (w, h))
+        self.label.configure(image=self.photo)
+        self.size = size
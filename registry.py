@@ -0,0 +1,122 @@
+class TrackedDict(dict):
+    # A dict that tells its registry whenever it's modified (existing code keeps using it like a dict)
+    def __init__(self, on_change, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._on_change = on_change
+
+    def __setitem__(self, key, value):
+        if key in self and self[key] == value:
+            return
+        super().__setitem__(key, value)
+        self._on_change()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._on_change()
+
+    def pop(self, key, *default):
+        had = key in self
+        value = super().pop(key, *default)
+        if had:
+            self._on_change()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self._on_change()
+        return item
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        self[key] = default
+        return default
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._on_change()
+
+    def clear(self):
+        if self:
+            super().clear()
+            self._on_change()
+
+
+class ToolRegistry:
+    """
+    The tool map (AprilTag ID -> tool name) and position map (AprilTag ID -> position ID)
+    with a version counter that goes up on every change. The maps are TrackedDicts and still
+    live in shared_data["tool_map"] / shared_data["pos"], so existing code doesn't change.
+
+    Anything derived from them (UI lists, reverse lookups) keys off `version`, so it only
+    gets rebuilt when something actually changed instead of every frame.
+    subscribe(callback) -> unsubscribe; callbacks get the registry, synchronously, on
+    whichever thread made the change (the Tk thread in practice).
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._listeners = []
+        self._derived = {}  # name -> (version, value)
+        self.tools = TrackedDict(self._changed)
+        self.positions = TrackedDict(self._changed)
+
+    def subscribe(self, callback):
+        self._listeners.append(callback)
+        return lambda: self._listeners.remove(callback) if callback in self._listeners else None
+
+    def _changed(self):
+        self.version += 1
+        for callback in list(self._listeners):
+            callback(self)
+
+    def derived(self, name, build):
+        # build(registry) once per version, then served from cache
+        cached = self._derived.get(name)
+        if cached is None or cached[0] != self.version:
+            cached = (self.version, build(self))
+            self._derived[name] = cached
+        return cached[1]
+
+    # --- lookups ---
+
+    def april_for_position(self, pos_id):
+        reverse = self.derived("april_for_position", lambda r: {p: a for a, p in r.positions.items()})
+        return reverse.get(pos_id)
+
+    def tool_lines(self):
+        # "(AprilTag ID: 3, Pos ID: 1): Scalpel" for every tool, sorted by tag id
+        def build(r):
+            lines = [f"(AprilTag ID: {tid}, Pos ID: {r.positions.get(tid, '<no pos>')}): {r.tools[tid]}"
+                     for tid in sorted(r.tools)]
+            return "\n".join(lines) if lines else "<no tools>"
+        return self.derived("tool_lines", build)
+
+
+class RegistryView:
+    """
+    Keeps one widget in sync with the registry: render(registry) runs once after the
+    registry changes (coalesced into a single after_idle, so a burst of edits = one redraw)
+    and never when nothing changed.
+    """
+
+    def __init__(self, registry, widget, render):
+        self.registry = registry
+        self.widget = widget
+        self.render = render
+        self.rendered_version = None
+        self._scheduled = False
+        self.unsubscribe = registry.subscribe(self._on_change)
+        self.refresh()
+
+    def _on_change(self, registry):
+        if not self._scheduled:
+            self._scheduled = True
+            self.widget.after_idle(self.refresh)
+
+    def refresh(self):
+        self._scheduled = False
+        if self.rendered_version == self.registry.version:
+            return
+        self.rendered_version = self.registry.version
+        self.render(self.registry)
@@ -0,0 +1,176 @@
+import numpy as np
+
+
+def in_view(corners, w, h):
+    # True if a tag with these (4, 2) corners sits at least one tag size inside a (w, h) frame,
+    # i.e. it can't have left the view between two frames by moving normally
+    lo, hi = corners.min(axis=0), corners.max(axis=0)
+    size = float((hi - lo).max())
+    return bool(lo[0] >= size and lo[1] >= size and hi[0] <= w - size and hi[1] <= h - size)
+
+
+class RoiTracker:
+    """
+    Tracking mode for an AprilTag detector. Once tags are found, later frames only run
+    the detector on small crops around where each tag is predicted to be (last corners
+    + constant-velocity motion). A full-frame scan still runs every `full_scan_every`
+    frames (to pick up new tools) and on the frame after any tracked tag goes missing.
+
+    Drop-in for the detector: tracker.detect(gray) returns the same Detection objects,
+    with corners/center/homography shifted back into full-frame pixels.
+    predictor(tag_ids, (w, h), at) -> {tag_id: (corners (4, 2), sigma_px)} can replace the pixel
+    extrapolation with a pose filter's prediction (tracker.ToolTracker.predict_corners); the
+    crop then gets 2 sigma of padding on top. Tags it leaves out fall back to extrapolation.
+    detect(gray, at=...) says when the frame was captured (time.monotonic() clock,
+    Frame.timestamp), so the prediction is for that frame and not for whenever it got detected.
+    After every detect(), expected / lost say how many tags seen on the previous frame should
+    have been found again (still well inside the view, see in_view) and how many of them
+    weren't: a tag that just walked out of the frame isn't a detection failure.
+    Not thread safe (same as the detector it wraps), keep it on one stage thread.
+    """
+
+    def __init__(self, detector, full_scan_every=15, margin=0.6, min_pad=16, max_roi_fraction=0.5):
+        self.detector = detector
+        self.full_scan_every = full_scan_every
+        self.margin = margin                    # padding as a fraction of the tag's size in px
+        self.min_pad = min_pad                  # ...but never less than this many px
+        self.max_roi_fraction = max_roi_fraction  # crops covering more than this -> just scan everything
+        self.enabled = True
+        self.predictor = None
+
+        self.tracks = {}          # tag_id -> {"corners", "velocity", "age"}
+        self.frames_since_scan = 0
+        self.force_scan = True
+        self.last_mode = "full"   # "full" or "roi", handy for the dashboard/debugging
+        self.last_rois = []
+        self.expected = 0         # tags of the last detect() that should have been found again...
+        self.lost = 0             # ...and how many of those weren't
+        self._expect = set()
+
+    def reset(self):
+        self.tracks.clear()
+        self.force_scan = True
+
+    def detect(self, gray, at=None):
+        h, w = gray.shape[:2]
+        # tags seen last frame that should still be in view
+        self._expect = {tid for tid, track in self.tracks.items()
+                        if track["age"] == 0 and in_view(track["corners"] + track["velocity"], w, h)}
+        if (not self.enabled or self.force_scan or not self.tracks
+                or self.frames_since_scan >= self.full_scan_every):
+            return self._full_scan(gray)
+
+        rois = self._predicted_rois(w, h, at)
+        area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in rois)
+        if area > self.max_roi_fraction * w * h:
+            return self._full_scan(gray)
+
+        found = {}
+        for x0, y0, x1, y1 in rois:
+            for tag in self.detector.detect(gray[y0:y1, x0:x1]):
+                shift_detection(tag, x0, y0)
+                # merged crops can overlap; keep the first hit for each id
+                found.setdefault(int(tag.tag_id), tag)
+
+        tags = list(found.values())
+        # a tracked tag went missing -> it could be anywhere now, rescan next frame
+        if any(tid not in found for tid in self.tracks):
+            self.force_scan = True
+
+        self.frames_since_scan += 1
+        self.last_mode = "roi"
+        self.last_rois = rois
+        self._count_losses(found)
+        self._update_tracks(tags, full=False)
+        return tags
+
+    def _full_scan(self, gray):
+        tags = self.detector.detect(gray)
+        self.frames_since_scan = 0
+        self.force_scan = False
+        self.last_mode = "full"
+        self.last_rois = []
+        self._count_losses({int(tag.tag_id) for tag in tags})
+        self._update_tracks(tags, full=True)
+        return tags
+
+    def _count_losses(self, found):
+        self.expected = len(self._expect)
+        self.lost = len(self._expect.difference(found))
+
+    def _update_tracks(self, tags, full):
+        seen = {}
+        for tag in tags:
+            tid = int(tag.tag_id)
+            corners = np.asarray(tag.corners, dtype=np.float64)
+            prev = self.tracks.get(tid)
+            if prev is not None:
+                # per-frame pixel velocity, averaged over however many frames it was missing
+                velocity = (corners - prev["corners"]) / (prev["age"] + 1)
+            else:
+                velocity = np.zeros_like(corners)
+            seen[tid] = {"corners": corners, "velocity": velocity, "age": 0}
+
+        if not full:
+            # tags that dropped out of their crop stay around until the next full scan settles it
+            for tid, track in self.tracks.items():
+                if tid not in seen:
+                    track["age"] += 1
+                    seen[tid] = track
+        self.tracks = seen
+
+    def _predicted_rois(self, w, h, at=None):
+        boxes = []
+        expected = self.predictor(list(self.tracks), (w, h), at) if self.predictor is not None else {}
+        for tid, track in self.tracks.items():
+            steps = track["age"] + 1
+            if tid in expected:
+                predicted, sigma = expected[tid]
+                slack = 2.0 * float(sigma)
+            else:
+                predicted = track["corners"] + track["velocity"] * steps
+                slack = float(np.abs(track["velocity"]).max()) * steps
+            lo = np.minimum(predicted.min(axis=0), track["corners"].min(axis=0))
+            hi = np.maximum(predicted.max(axis=0), track["corners"].max(axis=0))
+            size = float((hi - lo).max())
+            pad = max(self.margin * size, self.min_pad) + slack
+            box = [
+                max(int(lo[0] - pad), 0), max(int(lo[1] - pad), 0),
+                min(int(hi[0] + pad) + 1, w), min(int(hi[1] + pad) + 1, h),
+            ]
+            # predicted (mostly) off-screen: the detector segfaults on empty crops,
+            # and a sliver can't hold a tag anyway, so let the next full scan deal with it
+            if box[2] - box[0] < self.min_pad or box[3] - box[1] < self.min_pad:
+                self.force_scan = True
+                continue
+            boxes.append(box)
+        return _merge_boxes(boxes)
+
+
+def shift_detection(tag, dx, dy):
+    # A detection from a crop at (dx, dy) -> full-frame coordinates (in place; also used by detect_pool)
+    offset = np.array([dx, dy], dtype=np.float64)
+    tag.corners = tag.corners + offset
+    tag.center = tag.center + offset
+    if getattr(tag, "homography", None) is not None:
+        T = np.array([[1.0, 0.0, dx], [0.0, 1.0, dy], [0.0, 0.0, 1.0]])
+        tag.homography = T @ tag.homography
+
+
+def _merge_boxes(boxes):
+    # Union any overlapping crops so a tag sitting between two of them isn't cut in half
+    merged = True
+    while merged:
+        merged = False
+        out = []
+        for box in boxes:
+            for other in out:
+                if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]:
+                    other[0], other[1] = min(other[0], box[0]), min(other[1], box[1])
+                    other[2], other[3] = max(other[2], box[2]), max(other[3], box[3])
+                    merged = True
+                    break
+            else:
+                out.append(list(box))
+        boxes = out
+    return [tuple(b) for b in boxes]
@@ -0,0 +1,94 @@
+import numpy as np
+
+# Batched rotation math: every function takes N tags (or any leading shape) at once.
+#   quaternions       (..., 4) (w, x, y, z), unit unless said otherwise
+#   rotation vectors  (..., 3) axis * angle (rad), what cv2 calls rvec
+#   rotation matrices (..., 3, 3)
+# Everything goes through quaternions. log/exp use atan2 and sin(x)/x forms that stay accurate
+# from 0 all the way to pi (no arccos of a trace, no 1/sin(angle) blowing up near pi).
+
+
+def quat_mul(a, b):
+    aw, ax, ay, az = np.moveaxis(a, -1, 0)
+    bw, bx, by, bz = np.moveaxis(b, -1, 0)
+    return np.stack([
+        aw * bw - ax * bx - ay * by - az * bz,
+        aw * bx + ax * bw + ay * bz - az * by,
+        aw * by - ax * bz + ay * bw + az * bx,
+        aw * bz + ax * by - ay * bx + az * bw,
+    ], axis=-1)
+
+
+def quat_conj(q):
+    return q * np.array([1.0, -1.0, -1.0, -1.0])
+
+
+def quat_exp(rotvec):
+    # rotation vector (..., 3) -> unit quaternion
+    angle = np.linalg.norm(rotvec, axis=-1, keepdims=True)
+    half = 0.5 * angle
+    # sin(x/2)/x -> 1/2 for tiny angles
+    scale = np.where(angle > 1e-12, np.sin(half) / np.where(angle > 1e-12, angle, 1.0), 0.5)
+    return np.concatenate([np.cos(half), rotvec * scale], axis=-1)
+
+
+def quat_log(q):
+    # unit quaternion (..., 4) -> rotation vector (..., 3), the short way round (angle <= pi)
+    q = np.where(q[..., :1] < 0, -q, q)
+    vec = q[..., 1:]
+    norm = np.linalg.norm(vec, axis=-1, keepdims=True)
+    angle = 2.0 * np.arctan2(norm, q[..., :1])
+    return vec * np.where(norm > 1e-12, angle / np.where(norm > 1e-12, norm, 1.0), 2.0)
+
+
+def relative(q_from, q_to):
+    # rotation taking q_from to q_to, applied on the left (camera frame): q_to = relative * q_from
+    return quat_mul(q_to, quat_conj(q_from))
+
+
+def angular_velocity(q_prev, q_cur, dt):
+    """
+    Average angular velocity (rad/s, camera frame) that turns q_prev into q_cur in dt seconds,
+    for (N, 4) quaternions and scalar or (N,) dt. Along the rotation axis, magnitude = angular
+    speed; takes the short way round, so it's only meaningful below pi per dt.
+    dt <= 1e-6 gives 0.
+    """
+    dt = np.asarray(dt, dtype=np.float64)
+    ok = dt > 1e-6
+    return quat_log(relative(q_prev, q_cur)) * np.where(ok, 1.0 / np.where(ok, dt, 1.0), 0.0)[..., None]
+
+
+def from_matrix(R):
+    # (..., 3, 3) -> (..., 4) unit quaternions with w >= 0 (Shepperd's method, branch free)
+    R = np.asarray(R, dtype=np.float64)
+    m00, m01, m02, m10, m11, m12, m20, m21, m22 = np.moveaxis(R.reshape(R.shape[:-2] + (9,)), -1, 0)
+    # row k is 4 q_k * q: any of them gives q up to scale, the biggest q_k is the best conditioned
+    cand = np.stack([
+        np.stack([1.0 + m00 + m11 + m22, m21 - m12, m02 - m20, m10 - m01], axis=-1),
+        np.stack([m21 - m12, 1.0 + m00 - m11 - m22, m01 + m10, m02 + m20], axis=-1),
+        np.stack([m02 - m20, m01 + m10, 1.0 - m00 + m11 - m22, m12 + m21], axis=-1),
+        np.stack([m10 - m01, m02 + m20, m12 + m21, 1.0 - m00 - m11 + m22], axis=-1),
+    ], axis=-2)  # (..., 4, 4)
+    best = np.argmax(np.diagonal(cand, axis1=-2, axis2=-1), axis=-1)
+    q = np.take_along_axis(cand, best[..., None, None], axis=-2)[..., 0, :]
+    q /= np.linalg.norm(q, axis=-1, keepdims=True)
+    return np.where(q[..., :1] < 0, -q, q)
+
+
+def to_matrix(q):
+    # (..., 4) quaternions (w, x, y, z), not necessarily unit -> (..., 3, 3)
+    q = q / np.linalg.norm(q, axis=-1, keepdims=True)
+    w, x, y, z = np.moveaxis(q, -1, 0)
+    return np.stack([
+        1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y),
+        2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x),
+        2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y),
+    ], axis=-1).reshape(q.shape[:-1] + (3, 3))
+
+
+def matrix_to_rotvec(R):
+    return quat_log(from_matrix(R))
+
+
+def rotvec_to_matrix(rotvec):
+    return to_matrix(quat_exp(np.asarray(rotvec, dtype=np.float64)))
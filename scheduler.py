@@ -0,0 +1,168 @@
+import time
+
+
+class Rate:
+    """
+    One independently-clocked activity (preview, detection, pose, velocity panel, ...).
+    Ticks are due on a fixed grid of deadlines (next_due += period), not "sleep N ms after
+    the work", so the time the work itself takes (and timer lateness) comes out of the wait
+    instead of adding to it. Falling more than a period behind re-anchors the grid rather
+    than firing a burst of catch-up ticks.
+    hz=None means no limit: always due.
+
+    Also measures what it actually achieved (mark) and what one tick costs (record_cost),
+    both as EMAs, so the UI can show achieved vs target.
+    """
+
+    def __init__(self, hz=None, smoothing=0.1):
+        self.hz = None
+        self.period = 0.0
+        self.smoothing = smoothing
+        self.next_due = 0.0
+        self.interval = None  # EMA seconds between marks
+        self.cost = None      # EMA seconds per tick
+        self._last_mark = None
+        self.set(hz)
+
+    def set(self, hz):
+        self.hz = hz if hz and hz > 0 else None
+        self.period = 1.0 / self.hz if self.hz else 0.0
+        self.next_due = 0.0  # new rate: next check is due straight away
+
+    def ready(self, now=None):
+        return self.hz is None or (time.monotonic() if now is None else now) >= self.next_due
+
+    def delay(self, now=None):
+        # seconds until the next tick is due (0 if it already is)
+        if self.hz is None:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        return max(self.next_due - now, 0.0)
+
+    def advance(self, now=None):
+        now = time.monotonic() if now is None else now
+        self.next_due += self.period
+        if self.next_due < now - self.period:
+            self.next_due = now + self.period  # way behind (or first tick): start a fresh grid
+
+    def due(self, now=None):
+        # True (and consumes the tick) if it's time; the non-blocking check for worker loops
+        now = time.monotonic() if now is None else now
+        if not self.ready(now):
+            return False
+        self.advance(now)
+        return True
+
+    def wait(self, timeout):
+        # Worker threads: sleep until due (at most `timeout`); True if due now. Doesn't consume it.
+        d = self.delay()
+        if d > 0:
+            time.sleep(min(d, timeout))
+        return self.ready()
+
+    def mark(self, now=None):
+        # one unit of real work got done (a frame shown, a detection finished, ...)
+        now = time.monotonic() if now is None else now
+        if self._last_mark is not None:
+            dt = now - self._last_mark
+            self.interval = dt if self.interval is None else self.interval + self.smoothing * (dt - self.interval)
+        self._last_mark = now
+
+    def record_cost(self, seconds):
+        self.cost = seconds if self.cost is None else self.cost + self.smoothing * (seconds - self.cost)
+
+    def reset_stats(self):
+        self.interval = self.cost = self._last_mark = None
+
+    @property
+    def achieved(self):
+        return 1.0 / self.interval if self.interval else 0.0
+
+
+class Scheduler:
+    """
+    Runs callbacks on the Tk thread, each at its own rate (instead of one shared after(15)).
+    every(name, hz, fn) registers a task; set_rate() changes it live.
+    fn() returning False means "nothing to do this tick" (e.g. no new frame): the tick still
+    happens but doesn't count towards the achieved rate.
+    Each reschedule is aimed at the task's next deadline, after subtracting what the
+    callback just cost, so a 10 ms callback at 60 Hz waits ~6.7 ms, not 16.7 ms.
+    """
+
+    def __init__(self, widget, min_gap_ms=1):
+        self.widget = widget
+        self.min_gap_ms = min_gap_ms  # always give the event loop a breather between ticks
+        self.rates = {}
+        self._tasks = {}   # name -> fn
+        self._after = {}   # name -> pending after() id
+        self._running = False
+
+    def every(self, name, hz, fn):
+        self.rates[name] = Rate(hz)
+        self._tasks[name] = fn
+        if self._running:
+            self._schedule(name, 0)
+        return self.rates[name]
+
+    def set_rate(self, name, hz):
+        rate = self.rates[name]
+        rate.set(hz)
+        rate.reset_stats()
+        if self._running:
+            self._cancel(name)
+            self._schedule(name, 0)
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        for name, rate in self.rates.items():
+            rate.set(rate.hz)
+            rate.reset_stats()
+            self._schedule(name, 0)
+
+    def stop(self):
+        self._running = False
+        for name in list(self._after):
+            self._cancel(name)
+
+    # --- internals ---
+
+    def _schedule(self, name, delay_ms):
+        self._after[name] = self.widget.after(max(int(delay_ms), self.min_gap_ms), lambda: self._run(name))
+
+    def _cancel(self, name):
+        after_id = self._after.pop(name, None)
+        if after_id is not None:
+            self.widget.after_cancel(after_id)
+
+    def _run(self, name):
+        self._after.pop(name, None)
+        if not self._running:
+            return
+        rate = self.rates[name]
+        start = time.monotonic()
+        rate.advance(start)
+        try:
+            did_work = self._tasks[name]()
+        except Exception as e:
+            print(f"Scheduler task '{name}' failed: {e}")
+            did_work = False
+        end = time.monotonic()
+        rate.record_cost(end - start)
+        if did_work is not False:
+            rate.mark(end)
+        if self._running:
+            self._schedule(name, rate.delay(end) * 1000.0)
+
+
+def format_rates(rates, names=None):
+    # "preview 58/60 | detect 24/max | pose 24/max Hz" (achieved/target)
+    parts = []
+    for name in names or rates:
+        rate = rates.get(name)
+        if rate is None:
+            continue
+        target = f"{rate.hz:.0f}" if rate.hz else "max"
+        parts.append(f"{name} {rate.achieved:.0f}/{target}")
+    return ("Rates: " + " | ".join(parts) + " Hz") if parts else ""
@@ -0,0 +1,388 @@
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from buffers import BufferPool, CornerPacker
+from detector_tuning import DetectorTuner
+from overlay import OverlayCompositor, OverlayItem
+from roi_tracker import RoiTracker
+from scheduler import Rate
+
+# One solved tag: rvec/tvec keep solvePnP's (3, 1) shape so tvec[0][0] etc still work
+TagPose = namedtuple("TagPose", ["tag_id", "corners", "rvec", "tvec"])
+
+# origin + axis tips for the on-frame axes (same 2 cm length drawFrameAxes got)
+_AXIS_POINTS = np.array([[0, 0, 0], [0.02, 0, 0], [0, 0.02, 0], [0, 0, 0.02]], dtype=np.float64)
+
+
+class Stage:
+    """
+    One step of frame processing: process(packet) -> packet, or None to drop the frame
+    (returning None means the stage owns the packet now: release() it or hand it on).
+    Stages are composed per use case (a StageChain for a plain loop, pipeline.TagPipeline
+    for one thread per stage) and every call is timed automatically: stage.rate keeps the
+    EMA cost per frame and the achieved frames/s.
+      enabled = False    -> skip(packet) instead (default: pass the packet on untouched)
+      hz (rate.hz)       -> only process() when due, skip() in between
+    start()/stop() are called when the pipeline starts/stops.
+    """
+
+    name = "stage"
+
+    def __init__(self, enabled=True, hz=None):
+        self.enabled = enabled
+        self.rate = Rate(hz)
+
+    def __call__(self, packet):
+        if not self.enabled or not self.due():
+            return self.skip(packet)
+        start = time.monotonic()
+        out = self.process(packet)
+        end = time.monotonic()
+        self.rate.record_cost(end - start)
+        if out is not None:
+            self.rate.mark(end)
+        return out
+
+    def due(self):
+        return self.rate.due()
+
+    def process(self, packet):
+        return packet
+
+    def skip(self, packet):
+        return packet
+
+    def start(self):
+        self.rate.set(self.rate.hz)
+        self.rate.reset_stats()
+
+    def stop(self):
+        pass
+
+
+class StageChain:
+    """
+    An ordered set of stages, addressable by name: chain["pose"].enabled = False.
+    run(packet) pushes one packet through all of them on the calling thread (for simple
+    loops like pose_est.py); TagPipeline runs the same stages on worker threads instead.
+    """
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self.by_name = {stage.name: stage for stage in self.stages}
+        if len(self.by_name) != len(self.stages):
+            raise ValueError("Stage names in a chain have to be unique")
+
+    def __getitem__(self, name):
+        return self.by_name[name]
+
+    def __contains__(self, name):
+        return name in self.by_name
+
+    def __iter__(self):
+        return iter(self.stages)
+
+    def __len__(self):
+        return len(self.stages)
+
+    def get(self, name):
+        return self.by_name.get(name)
+
+    def enable(self, name, on=True):
+        self.by_name[name].enabled = on
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+        return self
+
+    def stop(self):
+        for stage in self.stages:
+            stage.stop()
+
+    def run(self, packet):
+        for stage in self.stages:
+            packet = stage(packet)
+            if packet is None:
+                return None
+            packet.stamp(stage.name)
+        return packet
+
+    def timing_summary(self):
+        # "gray 0.6 | detect 14.2 | pose 0.3 ms" (EMA cost per frame of every enabled stage)
+        parts = [f"{s.name} {s.rate.cost * 1000:.1f}" for s in self.stages if s.enabled and s.rate.cost is not None]
+        return ("Stage cost: " + " | ".join(parts) + " ms") if parts else ""
+
+
+# --- stages ---
+
+class GrayStage(Stage):
+    # converts into a recycled buffer the packet owns (buffers.py), not a fresh array per frame;
+    # raw-captured frames (camera.CameraStream capture_format) already have their luminance
+    name = "gray"
+
+    def __init__(self, enabled=True, pool=None):
+        super().__init__(enabled)
+        self.pool = pool if pool is not None else BufferPool(name="gray")
+
+    def process(self, packet):
+        if packet.frame.gray is not None:
+            packet.gray = packet.frame.gray  # a view into the frame's buffer, the packet holds that
+            return packet
+        image = packet.frame.image
+        buf = self.pool.acquire(image.shape[:2])
+        packet.buffers.append(buf)
+        packet.gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=buf.array)
+        return packet
+
+
+class DetectStage(Stage):
+    """
+    detector.detect(gray) -> packet.tags / packet.seen_ids. A RoiTracker (or a DetectorTuner
+    driving one) also gets the frame's capture time, for its crop prediction.
+    hz is enforced where frames enter the pipeline (TagPipeline admits a frame only when a
+    detection is due), so nothing gets converted to gray just to be thrown away here.
+    """
+
+    name = "detect"
+
+    def __init__(self, detector, enabled=True, hz=None):
+        super().__init__(enabled, hz)
+        self.detector = detector
+        self.timed = isinstance(detector, (RoiTracker, DetectorTuner))
+
+    def due(self):
+        return True  # gated at admission
+
+    def process(self, packet):
+        if self.timed:
+            packet.tags = self.detector.detect(packet.gray, at=packet.timestamp)
+        else:
+            packet.tags = self.detector.detect(packet.gray)
+        packet.seen_ids = {int(tag.tag_id) for tag in packet.tags}
+        return packet
+
+
+class PooledDetectStage(DetectStage):
+    """
+    Same, on a detect_pool.DetectorPool: process() only hands the frame to the worker
+    processes (and returns None), collect() gives finished packets back in order.
+    TagPipeline runs collect() on a thread of its own.
+    """
+
+    def start(self):
+        super().start()
+        self.detector.on_discard = _release  # stale packets still hold pooled buffers
+        self.detector.start()
+        self.detector.drain()  # results from our last run are stale now
+
+    def __call__(self, packet):
+        if not self.enabled:
+            return self.skip(packet)
+        packet.submitted_at = time.monotonic()
+        if not self.detector.submit(packet.gray, packet):
+            packet.release()  # every slot busy, the frame is dropped
+        return None  # comes back through collect()
+
+    def collect(self, timeout):
+        result = self.detector.get(timeout=timeout)
+        if result is None:
+            return None
+        packet, tags = result
+        packet.tags = tags
+        packet.seen_ids = {int(tag.tag_id) for tag in tags}
+        now = time.monotonic()
+        self.rate.record_cost(now - packet.submitted_at)  # wall time in the pool, not CPU
+        self.rate.mark(now)
+        return packet
+
+
+def _release(packet):
+    packet.release()
+
+
+def detect_stage(detector, hz=None):
+    # picks the async stage for a DetectorPool
+    return PooledDetectStage(detector, hz=hz) if hasattr(detector, "submit") else DetectStage(detector, hz=hz)
+
+
+class PoseStage(Stage):
+    """
+    Every tag of the frame through the batched solver in one go (pose_solver.PoseSolver).
+    Between pose ticks (hz) each tag keeps its last solve with this frame's corners and the
+    packet is marked pose_fresh = False, so velocity only ever sees real solves.
+    """
+
+    name = "pose"
+
+    def __init__(self, solver, enabled=True, hz=None):
+        super().__init__(enabled, hz)
+        self.solver = solver
+        self.packer = CornerPacker()  # corners of all tags -> one reused (N, 4, 2) array
+        self._held = {}  # tag_id -> last solved TagPose
+
+    def start(self):
+        super().start()
+        self._held = {}
+
+    def __call__(self, packet):
+        if not packet.tags:
+            return packet
+        return super().__call__(packet)
+
+    def skip(self, packet):
+        if self.enabled:
+            # not a pose tick: carry each tag's last solve over, with this frame's corners
+            packet.poses = [self._held[int(tag.tag_id)]._replace(corners=tag.corners)
+                            for tag in packet.tags if int(tag.tag_id) in self._held]
+            packet.pose_fresh = False
+        return packet
+
+    def process(self, packet):
+        tags = packet.tags
+        h, w = packet.gray.shape[:2]
+        batch = self.solver.solve(self.packer.pack(tags), image_size=(w, h))
+        packet.pose_batch = batch
+        for i, tag in enumerate(tags):
+            if not batch.ok[i]:
+                continue  # Skip if pose estimation failed
+            packet.poses.append(TagPose(int(tag.tag_id), tag.corners,
+                                        batch.rvecs[i].reshape(3, 1), batch.tvecs[i].reshape(3, 1)))
+        self._held = {pose.tag_id: pose for pose in packet.poses}
+        return packet
+
+
+class VelocityStage(Stage):
+    # update(packet) with every packet that has freshly solved poses (tracker.ToolTracker)
+    name = "velocity"
+
+    def __init__(self, update, enabled=True):
+        super().__init__(enabled)
+        self.update = update
+
+    def process(self, packet):
+        if packet.pose_fresh and packet.poses:
+            self.update(packet)
+        return packet
+
+
+class OverlayStage(Stage):
+    """
+    Labels + axes onto a copy of the frame -> packet.image (overlay.OverlayCompositor).
+    describe(tag_id) -> (tool_name, helping_text, id_display) builds the label.
+    undistort_display shows the remapped (undistorted) frame instead of the raw one.
+    The copy drawn on comes from a buffer pool and is owned by the packet; frames with
+    nothing to draw just pass the raw image through.
+    Disabled: packet.image stays None.
+    """
+
+    name = "overlay"
+
+    def __init__(self, geometry, describe, overlay=None, undistort_display=False, enabled=True, pool=None):
+        super().__init__(enabled)
+        self.geometry = geometry
+        self.describe = describe
+        self.overlay = overlay if overlay is not None else OverlayCompositor()
+        self.undistort_display = undistort_display
+        self.pool = pool if pool is not None else BufferPool(name="overlay")
+
+    def process(self, packet):
+        geometry = self.geometry
+        overlay = self.overlay
+        image = packet.frame.image
+        h, w = image.shape[:2]
+        if self.undistort_display or (overlay.enabled and packet.poses):
+            buf = self.pool.acquire(image.shape)
+            packet.buffers.append(buf)
+            if self.undistort_display:
+                # remapped straight into our buffer; axes then get projected without distortion
+                frame = geometry.undistort_image(image, dst=buf.array)
+            else:
+                frame = buf.array  # the raw frame may be shared with other consumers: draw on a copy
+                np.copyto(frame, image)
+        else:
+            packet.image = packet.frame.image  # nothing to draw, nobody writes to it
+            return packet
+
+        if overlay.enabled and packet.poses:
+            if packet.pose_batch is not None and len(packet.poses) >= overlay.min_batch:
+                # every tag's axis endpoints in one (N, 4, 3) stack -> one vectorized projection
+                batch = packet.pose_batch
+                R, t = batch.rotations[batch.ok], batch.tvecs[batch.ok]
+                axes = np.einsum("nij,kj->nki", R, _AXIS_POINTS) + t[:, None, :]
+                axes = geometry.project(axes, (w, h), distort=not self.undistort_display)
+                overlay.draw_axes(frame, axes)
+            else:
+                # a handful of tags: the fixed NumPy overhead loses to plain drawFrameAxes
+                K = geometry.matrix_for((w, h))
+                dist = geometry.zero_dist if self.undistort_display else geometry.dist_coeffs
+                for pose in packet.poses:
+                    cv2.drawFrameAxes(frame, K, dist, pose.rvec, pose.tvec, 0.02, overlay.axis_thickness)
+
+            anchors = np.array([pose.corners[0] for pose in packet.poses], dtype=np.float64)
+            if self.undistort_display:
+                anchors = geometry.to_pixels(geometry.normalize(anchors, (w, h)), (w, h))
+            items = []
+            for pose, anchor in zip(packet.poses, anchors):
+                tool_name, helping_text, id_display = self.describe(pose.tag_id)
+                items.append(OverlayItem(pose.tag_id, (anchor[0], anchor[1] - 10),
+                                         f"{tool_name} ({helping_text}: {id_display}) ",
+                                         pose.tvec.ravel(), None))
+            overlay.forget(packet.seen_ids)
+            overlay.render(frame, items, packet.timestamp)
+        packet.image = frame
+        return packet
+
+
+class PilDisplayStage(Stage):
+    """
+    packet.image -> packet.display, a PIL image fitted (4:3) into display_size() -> (max_w, max_h)
+    (None while the label isn't laid out). Only for UIs that don't use preview.PreviewRenderer.
+    """
+
+    name = "display"
+
+    def __init__(self, display_size, enabled=True):
+        super().__init__(enabled)
+        self.display_size = display_size
+
+    def process(self, packet):
+        size = self.display_size()
+        if size and packet.image is not None:
+            import helpers  # UI-only; helpers pulls in customtkinter, headless never gets here
+            img = Image.fromarray(cv2.cvtColor(packet.image, cv2.COLOR_BGR2RGB))
+            packet.display = helpers.resize_to_fit_4_3(img, size[0], size[1])
+        return packet
+
+
+class CallbackSink(Stage):
+    # hands every packet to fn(packet) (logging, printing, forwarding...) and passes it on
+    name = "sink"
+
+    def __init__(self, fn, name=None, enabled=True):
+        super().__init__(enabled)
+        self.fn = fn
+        if name is not None:
+            self.name = name
+
+    def process(self, packet):
+        self.fn(packet)
+        return packet
+
+
+class ImshowSink(Stage):
+    # cv2.imshow(window, packet.image); HighGUI wants the main thread, so StageChain.run only
+    name = "imshow"
+
+    def __init__(self, window, enabled=True):
+        super().__init__(enabled)
+        self.window = window
+
+    def process(self, packet):
+        image = packet.image if packet.image is not None else packet.frame.image
+        cv2.imshow(self.window, image)
+        return packet
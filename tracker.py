@@ -0,0 +1,433 @@
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+import CONSTANTS
+from detect_pool import DetectorPool
+from detector_tuning import DetectorTuner
+from geometry import calibrated_size
+from kalman import PoseFilter
+from kinematics import KinematicsStore
+from overlay import OverlayCompositor
+from pipeline import FramePacket, LatestQueue, TagPipeline
+from stages import GrayStage, OverlayStage, PoseStage, VelocityStage, detect_stage
+from pose_solver import PoseSolver
+from registry import ToolRegistry
+from roi_tracker import RoiTracker
+from rotations import angular_velocity, from_matrix, rotvec_to_matrix, to_matrix
+from scheduler import Rate
+from velocity import WindowedVelocity
+
+# Everything in here runs without customtkinter: the dashboard is just one client of ToolTracker.
+
+# Define physical tag size (in meters)
+tag_size = 0.015
+
+# Real-world 3D coordinates of tag corners (same order as pupil_apriltags output)
+obj_points = np.array([
+    [-tag_size/2,  tag_size/2, 0],
+    [ tag_size/2,  tag_size/2, 0],
+    [ tag_size/2, -tag_size/2, 0],
+    [-tag_size/2, -tag_size/2, 0]
+], dtype=np.float32)
+
+# Latest known state of one tool (camera frame, meters / seconds)
+# position_std / rotation_std: filter uncertainty (NaN without the filter); tracked = visible,
+# or lost but still coasting (see ToolTracker.state)
+ToolState = namedtuple("ToolState", ["tag_id", "name", "position_id", "rvec", "tvec",
+                                     "linear_velocity", "angular_velocity", "updated_at", "visible",
+                                     "position_std", "rotation_std", "tracked"])
+
+
+def load_pose_solver(calibration="camera_calibration.npz"):
+    data = np.load(calibration)
+    return PoseSolver(data["camera_matrix"], data["dist_coeffs"], obj_points, calibrated_size=calibrated_size(data))
+
+
+class VelocitySubscription:
+    """
+    One consumer following one tool (ToolTracker.subscribe_velocity). callback(ToolState)
+    runs on the tracker thread, only when there's something new: a fresh velocity for the
+    tag, or the tag going lost / being tracked again. Updates that come in faster than `hz`
+    are coalesced into the newest one. Delivers until close().
+    """
+
+    def __init__(self, tracker, tag_id, callback, hz=None):
+        self.tracker = tracker
+        self.tag_id = tag_id
+        self.callback = callback
+        self.rate = Rate(hz)    # also what the UI shows as achieved/target
+        self.updated_at = None  # velocity update time of the last delivery
+        self.tracked = None     # what the last delivery said
+
+    def set_rate(self, hz):
+        self.rate.set(hz)
+        self.rate.reset_stats()
+
+    def close(self):
+        self.tracker.unsubscribe_velocity(self)
+
+
+def make_detector(detect_pool=None):
+    # The detector chain CONSTANTS asks for (pool, or shared detector + ROI tracking + adaptive tuning)
+    if detect_pool is not None:
+        # worker processes do the detecting; ROI tracking/tuning need frames in lockstep, so they're off
+        return detect_pool
+    detector = CONSTANTS.detector
+    tracker = None
+    if CONSTANTS.ROI_TRACKING:
+        # tracks tags around the shared detector
+        detector = tracker = RoiTracker(detector, full_scan_every=CONSTANTS.FULL_SCAN_EVERY)
+    if CONSTANTS.ADAPTIVE_DETECTOR:
+        # picks between pre-built detector profiles (and drives the ROI tracker if there is one)
+        detector = DetectorTuner(CONSTANTS.DETECTOR_PROFILES, CONSTANTS.DETECT_BUDGET_MS,
+                                 CONSTANTS.DETECTOR_BASE_PARAMS, tracker=tracker)
+    return detector
+
+
+def make_pose_filter():
+    return PoseFilter(order=CONSTANTS.FILTER_ORDER, pos_std=CONSTANTS.FILTER_POS_STD, rot_std=CONSTANTS.FILTER_ROT_STD,
+                      pos_process=CONSTANTS.FILTER_POS_PROCESS, rot_process=CONSTANTS.FILTER_ROT_PROCESS)
+
+
+def make_window_velocity():
+    return WindowedVelocity(window=CONSTANTS.VELOCITY_WINDOW, order=CONSTANTS.VELOCITY_POLY_ORDER,
+                            max_span=CONSTANTS.VELOCITY_MAX_SPAN)
+
+
+def load_tools(path, registry):
+    # {"tools": {"3": "Scalpel", ...}, "positions": {"3": 1, ...}} -> registry (JSON keys are strings)
+    import json
+    with open(path) as f:
+        config = json.load(f)
+    registry.tools.update({int(k): v for k, v in config.get("tools", {}).items()})
+    registry.positions.update({int(k): v for k, v in config.get("positions", {}).items()})
+    return registry
+
+
+class ToolTracker:
+    """
+    Headless tracking service: gray -> detect -> pose -> velocity -> overlay stages on the
+    pipeline threads (the overlay stage is off unless someone wants frames). No Tk anywhere,
+    so it runs on the tracking boxes as-is; the dashboard drives the same object (through
+    frame_bus.FrameBus).
+
+    Configured from a ToolRegistry (same tool map / position map the dashboard edits).
+    Programmatic API, all safe to call from any thread:
+        state(tag_id, at=None) -> ToolState     states(at=None) -> {tag_id: ToolState} for every solved tag
+        velocity(tag_id) -> (v, w) or None      updated_at(tag_id) -> capture time of the last solve
+        visible_ids                             set of tag ids in the newest frame
+        subscribe_velocity(tag_id, callback, hz=None) -> VelocitySubscription (pushed updates, close() to stop)
+    With the "kalman" estimator (CONSTANTS.VELOCITY_ESTIMATOR) poses and velocities are
+    filtered (kalman.PoseFilter), state(at=time.monotonic()) is the latency-compensated
+    prediction for right now, and an ROI-tracking detector gets its crops from predictions.
+    "window" fits velocities over each tag's recent history (velocity.WindowedVelocity),
+    "difference" is the plain two-sample finite difference.
+    A UI client can also take the finished packets (annotated frames) with poll().
+    """
+
+    def __init__(self, camera, registry=None, solver=None, detector=None, describe=None, overlay=None,
+                 history=10, detect_hz=None, pose_hz=None, backlog=8, estimator=None, pose_filter=None,
+                 debug=False):
+        self.camera = camera
+        self.registry = registry if registry is not None else ToolRegistry()
+        self.solver = solver if solver is not None else load_pose_solver()
+        self.debug = debug  # print non-zero velocities as they come in
+
+        # headless by default: nothing to draw on, nobody to show it to
+        if overlay is None:
+            overlay = OverlayCompositor(enabled=False)
+        detector = detector if detector is not None else make_detector()
+        self.pipeline = TagPipeline(camera, [
+            GrayStage(),
+            detect_stage(detector, hz=detect_hz),
+            PoseStage(self.solver, hz=pose_hz),
+            VelocityStage(self._update_velocity),
+            OverlayStage(self.solver.geometry, describe or self._describe_tag, overlay,
+                         undistort_display=CONSTANTS.UNDISTORT_DISPLAY, enabled=overlay.enabled),
+        ], result_backlog=backlog)
+        # finished packets for a UI client (poll); ones nobody took give their buffers back
+        self.output = LatestQueue(backlog, on_drop=FramePacket.release)
+
+        # pose history + latest v, w of every tag (ring buffers, one slot per tag)
+        self._lock = threading.Lock()
+        self.estimator = estimator or CONSTANTS.VELOCITY_ESTIMATOR
+        self.filter = None
+        self.fit = None
+        if self.estimator == "window":
+            self.fit = make_window_velocity()
+            history = max(history, self.fit.window)
+        self.kinematics = KinematicsStore(history)
+        if self.estimator == "kalman":
+            self.filter = pose_filter if pose_filter is not None else make_pose_filter()
+            roi = getattr(detector, "tracker", detector)  # a DetectorTuner drives its RoiTracker
+            if isinstance(roi, RoiTracker):
+                roi.predictor = self.predict_corners
+        self.poses = {}                # tid -> last solved TagPose
+        self.visible_ids = set()
+        self._velocity_subs = []       # VelocitySubscription, served by _consume_loop
+
+        self._thread = None
+        self._running = False
+
+    # --- lifecycle (also what frame_bus.FrameBus drives) ---
+
+    @property
+    def running(self):
+        return self._running
+
+    def configure(self, pose=True, overlay=True, velocity=True):
+        self.pipeline.configure(pose=pose or velocity, velocity=velocity, overlay=overlay)
+
+    def start(self):
+        if self._running:
+            return self
+        self.output.reopen()
+        self.pipeline.start()
+        self._running = True
+        self._thread = threading.Thread(target=self._consume_loop, name="tracker", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self.output.close()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self.pipeline.stop()
+
+    def poll(self):
+        # Oldest finished packet a UI client hasn't taken yet, or None; the caller owns it (release())
+        return self.output.get_nowait()
+
+    # --- API ---
+
+    def velocity(self, tag_id):
+        with self._lock:
+            return self.kinematics.velocity(tag_id)
+
+    def updated_at(self, tag_id):
+        # capture time of the last v, w update (monotonic seconds)
+        with self._lock:
+            return self.kinematics.last_update(tag_id)
+
+    def subscribe_velocity(self, tag_id, callback, hz=None):
+        # Push instead of polling: see VelocitySubscription (callback runs on the tracker thread)
+        sub = VelocitySubscription(self, tag_id, callback, hz)
+        with self._lock:
+            self._velocity_subs.append(sub)
+        return sub
+
+    def unsubscribe_velocity(self, sub):
+        with self._lock:
+            if sub in self._velocity_subs:
+                self._velocity_subs.remove(sub)
+
+    def state(self, tag_id, at=None):
+        """
+        Kalman estimator: the filtered pose / velocities, predicted to `at` (time.monotonic()
+        clock; default: the last update). A tag that's out of sight is still `tracked`
+        while the prediction is within COAST_POS_STD / COAST_ROT_STD.
+        Window / difference estimators: the last raw solve, tracked for LAST_SEEN_LIMIT ms after it.
+        """
+        with self._lock:
+            pose = self.poses.get(tag_id)
+            if pose is None:
+                return None
+            name, position_id = self.registry.tools.get(tag_id), self.registry.positions.get(tag_id)
+            visible = tag_id in self.visible_ids
+            updated_at = self.kinematics.last_update(tag_id)
+            slot = self.kinematics.slot_of.get(tag_id)
+            if self.filter is not None and slot is not None and self.filter.live[slot]:
+                est = self.filter.predict([slot], self.filter.t[slot] if at is None else at)
+                tracked = visible or (est.position_std[0] <= CONSTANTS.COAST_POS_STD
+                                      and est.rotation_std[0] <= CONSTANTS.COAST_ROT_STD)
+                return ToolState(tag_id, name, position_id, est.rvec[0], est.position[0],
+                                 est.linear_velocity[0], est.angular_velocity[0], updated_at, visible,
+                                 float(est.position_std[0]), float(est.rotation_std[0]), tracked)
+            v, w = self.kinematics.velocity(tag_id) or (np.zeros(3), np.zeros(3))
+            now = time.monotonic() if at is None else at
+            tracked = visible or (updated_at is not None and (now - updated_at) * 1000.0 <= CONSTANTS.LAST_SEEN_LIMIT)
+            return ToolState(tag_id, name, position_id, pose.rvec.ravel(), pose.tvec.ravel(), v, w,
+                             updated_at, visible, np.nan, np.nan, tracked)
+
+    def states(self, at=None):
+        # every tag solved at least once (name / position_id are None if it isn't in the maps)
+        with self._lock:
+            ids = list(self.poses)
+        return {tid: state for tid in ids if (state := self.state(tid, at)) is not None}
+
+    def predict_corners(self, tag_ids, size, at=None):
+        """
+        Where the filter expects each tag's corners in a (w, h) frame at `at`, for RoiTracker:
+        {tag_id: ((4, 2) pixels, x/y position std in px)}. Tags the filter doesn't know, or
+        that are behind the camera, are left out.
+        `at` defaults to now; RoiTracker passes the capture time of the frame it's cropping.
+        """
+        at = time.monotonic() if at is None else at
+        with self._lock:
+            slots = self.kinematics.slots(tag_ids)
+            known = slots >= 0
+            known[known] = self.filter.live[slots[known]]
+            if not known.any():
+                return {}
+            est = self.filter.predict(slots[known], at)
+        R = to_matrix(est.quat)
+        corners = np.einsum("kij,mj->kmi", R, self.solver.obj_points) + est.position[:, None, :]
+        pixels = self.solver.geometry.project(corners, size)
+        focal = self.solver.geometry.matrix_for(size)[0, 0]
+        depth = est.position[:, 2]
+        # only x/y uncertainty moves the tag across the image (depth barely does)
+        lateral = np.sqrt(est.position_cov[:, :2, 0, 0].max(axis=1))
+        ids = np.asarray(tag_ids)[known]
+        return {int(tid): (pixels[k], focal * lateral[k] / depth[k])
+                for k, tid in enumerate(ids) if depth[k] > 1e-3}
+
+    # --- internals ---
+
+    def _describe_tag(self, tag_id):
+        tool_name = self.registry.tools.get(tag_id, f"Unknown Tool {tag_id}")
+        return tool_name, "April_ID", tag_id
+
+    def _consume_loop(self):
+        while self._running:
+            packet = self.pipeline.poll(timeout=0.1)
+            if packet is None:
+                continue
+            with self._lock:
+                self.visible_ids = packet.seen_ids
+                if packet.pose_fresh:
+                    for pose in packet.poses:
+                        self.poses[pose.tag_id] = pose
+                subs = list(self._velocity_subs)
+            if subs:
+                self._push_velocity(subs)
+            self.output.put(packet)
+
+    def _push_velocity(self, subs):
+        # once per packet: hand every subscriber its tool's state if there's news and its rate allows
+        now = time.monotonic()
+        for sub in subs:
+            if not sub.rate.ready(now):
+                continue  # whatever is new stays new until the next due packet (coalesced)
+            updated_at = self.updated_at(sub.tag_id)
+            fresh = updated_at is not None and updated_at != sub.updated_at
+            if not fresh and not sub.tracked:
+                continue  # nothing new, and nothing that could go lost
+            state = self.state(sub.tag_id, at=now)
+            if state is None or (not fresh and state.tracked == sub.tracked):
+                continue
+            sub.rate.advance(now)
+            sub.rate.mark(now)
+            sub.updated_at, sub.tracked = updated_at, state.tracked
+            try:
+                sub.callback(state)
+            except Exception as e:
+                print(f"Velocity subscriber for tag {sub.tag_id} failed: {e}")
+
+    def _update_velocity(self, packet):
+        # VelocityStage callback (pipeline thread), only ever gets real solves
+        poses = packet.poses
+        batch = packet.pose_batch
+        if batch is not None and len(poses) == int(batch.ok.sum()):
+            R = batch.rotations[batch.ok]  # the solver's own rotations, same order as poses
+        else:
+            R = rotvec_to_matrix(np.array([pose.rvec.ravel() for pose in poses], dtype=np.float64))
+        tvecs = np.array([pose.tvec.ravel() for pose in poses], dtype=np.float64)
+        with self._lock:
+            self.organize_velocity_data([pose.tag_id for pose in poses], R, tvecs, packet.timestamp)
+
+    def organize_velocity_data(self, tag_ids, R, tvecs, captured_at=None):
+        """
+        One frame's worth of tags: appends their poses to the kinematics store and updates
+        (linear_vel_mps[3], angular_vel_radps[3]) in the camera frame for each, all vectorized.
+        R (N, 3, 3), tvecs (N, 3). Units assume your obj_points are in meters -> tvec is meters.
+        captured_at = when the frame was exposed (time.monotonic() clock, Frame.timestamp),
+        so detection jitter doesn't turn into velocity noise
+        """
+        if not len(tag_ids):
+            return
+        now = time.monotonic() if captured_at is None else captured_at
+        store = self.kinematics
+        quats = from_matrix(R)
+        slots = store.append(tag_ids, now, tvecs, quats)
+
+        if self.filter is not None:
+            est = self.filter.update(slots, now, tvecs, quats)
+            store.set_velocity(slots, est.linear_velocity, est.angular_velocity, now)
+            self._debug_velocity(tag_ids, est.linear_velocity, est.angular_velocity)
+            return
+
+        if self.fit is not None:
+            v, w = self.fit.estimate(*store.window(slots, self.fit.window))
+            store.set_velocity(slots, v, w, now)
+            self._debug_velocity(tag_ids, v, w)
+            return
+
+        # finite differences against each tag's previous sample (none yet / too close -> 0)
+        t, p, q, valid = store.window(slots, 2)
+        dt = t[:, 1] - t[:, 0]
+        ok = valid[:, 0] & (dt > 1e-3)
+        safe_dt = np.where(ok, dt, 1.0)
+        v = np.where(ok[:, None], (p[:, 1] - p[:, 0]) / safe_dt[:, None], 0.0)  # m/s in camera frame
+        w = angular_velocity(q[:, 0], q[:, 1], np.where(ok, dt, 0.0))  # rad/s
+        store.set_velocity(slots, v, w, now)
+        self._debug_velocity(tag_ids, v, w, dt)
+
+    def _debug_velocity(self, tag_ids, v, w, dt=None):
+        # Debug: print velocity when it's non-zero
+        if self.debug:
+            for i in np.flatnonzero(np.linalg.norm(v, axis=1) > 0.001):  # Only print if velocity > 1mm/s
+                print(f"Tag {tag_ids[i]}: v={v[i]}, w={w[i]}" + (f", dt={dt[i]:.3f}s" if dt is not None else ""))
+
+
+def main():
+    import argparse
+    import json
+
+    from camera import CameraStream
+
+    parser = argparse.ArgumentParser(description="Headless AprilTag tool tracker (no UI)")
+    parser.add_argument("--camera", type=int, default=0, help="camera index")
+    parser.add_argument("--tools", help='JSON file: {"tools": {"3": "Scalpel"}, "positions": {"3": 1}}')
+    parser.add_argument("--calibration", default="camera_calibration.npz")
+    parser.add_argument("--hz", type=float, default=10.0, help="how often to print tool states")
+    args = parser.parse_args()
+
+    registry = ToolRegistry()
+    if args.tools:
+        load_tools(args.tools, registry)
+    pool = None
+    if CONSTANTS.DETECT_POOL:
+        pool = DetectorPool(CONSTANTS.DETECT_POOL_PARAMS, workers=CONSTANTS.DETECT_POOL_WORKERS,
+                            tiles=CONSTANTS.DETECT_POOL_TILES)
+    camera = CameraStream(args.camera, capture_format=CONSTANTS.CAPTURE_FORMAT).start()
+    tracker = ToolTracker(camera, registry, solver=load_pose_solver(args.calibration), detector=make_detector(pool),
+                          detect_hz=CONSTANTS.DETECT_FPS, pose_hz=CONSTANTS.POSE_FPS).start()
+    try:
+        while True:
+            time.sleep(1.0 / args.hz)
+            # one JSON line per tracked tool, predicted to now (visible False = coasting)
+            for tid, s in tracker.states(at=time.monotonic()).items():
+                if not s.tracked:
+                    continue
+                print(json.dumps({"tag_id": tid, "name": s.name, "position_id": s.position_id, "t": s.updated_at,
+                                  "visible": s.visible,
+                                  "position_std": None if np.isnan(s.position_std) else s.position_std,
+                                  "tvec": s.tvec.tolist(), "rvec": s.rvec.tolist(),
+                                  "v": np.asarray(s.linear_velocity).tolist(),
+                                  "w": np.asarray(s.angular_velocity).tolist()}))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        tracker.stop()
+        if pool is not None:
+            pool.close()
+        camera.release()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import numpy as np
+
+from rotations import quat_log, relative
+
+
+class WindowedVelocity:
+    """
+    Linear and angular velocity from a least-squares polynomial fit over each tag's recent
+    samples (Savitzky-Golay, but on the real, non-uniform capture times), for all tags at once.
+    Works on kinematics.KinematicsStore.window() output:
+        estimate(t (K, n), p (K, n, 3), q (K, n, 4), valid (K, n)) -> v (K, 3), w (K, 3)
+
+    Every tag gets p(tau) ~ c0 + c1 tau + ... + c_order tau^order fitted to its last `window`
+    samples (tau = time before the newest sample, samples older than max_span seconds
+    ignored), and the velocity is c1: the slope at the newest sample. Rotations are fitted
+    the same way as rotation vectors relative to the newest orientation (camera frame, small
+    over one window), so the slope is the angular velocity.
+    order=1 is a plain least-squares line; order=2 follows accelerating tools with less lag.
+    Tags with too few samples for `order` fall back to a lower one (one sample -> zero).
+    The fit is linear in the samples, so it boils down to one weight per sample
+    (_slope_weights) and two weighted sums.
+    """
+
+    def __init__(self, window=10, order=2, max_span=0.5):
+        if order < 1:
+            raise ValueError("order has to be at least 1 (a line)")
+        self.window = window
+        self.order = order
+        self.max_span = max_span
+
+    def estimate(self, t, p, q, valid):
+        t, p, q = t[:, -self.window:], p[:, -self.window:], q[:, -self.window:]
+        tau = t - t[:, -1:]
+        valid = valid[:, -self.window:] & (tau >= -self.max_span)
+        h = _slope_weights(tau, valid, self.order)
+        # rotation of every sample relative to the newest one, as a rotation vector
+        rel = quat_log(relative(q[:, -1:], q))
+        return np.einsum("kn,knc->kc", h, p), np.einsum("kn,knc->kc", h, rel)
+
+
+def _slope_weights(tau, valid, order):
+    """
+    Savitzky-Golay weights per row: slope of the least-squares polynomial through the valid
+    samples at tau = 0 is sum_n h[k, n] * y[k, n]. tau (K, n) seconds (<= 0), valid (K, n).
+    Rows with m valid samples get order min(order, m - 1) (the unused columns are masked
+    out of the same batched solve); rows with one sample get all-zero weights.
+    """
+    d = order + 1
+    scale = np.abs(np.where(valid, tau, 0.0)).max(axis=1)
+    scale = np.where(scale > 1e-9, scale, 1.0)  # tau scaled to [-1, 0]: well conditioned
+    used = np.arange(d) <= np.minimum(valid.sum(axis=1) - 1, order)[:, None]  # (K, d)
+    A = (tau / scale[:, None])[..., None] ** np.arange(d) * (valid[..., None] & used[:, None, :])
+    G = np.einsum("kni,knj->kij", A, A)
+    G[:, range(d), range(d)] += ~used  # masked columns: identity, so their coefficient comes out 0
+    G[:, range(d), range(d)] += 1e-9   # repeated timestamps
+    e1 = np.zeros((len(tau), d, 1))
+    e1[:, 1] = 1.0
+    x = np.linalg.solve(G, e1)[..., 0]  # row 1 of G^-1 (symmetric)
+    return np.einsum("ki,kni->kn", x, A) / scale[:, None]